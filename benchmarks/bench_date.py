@@ -0,0 +1,45 @@
+"""
+Micro-benchmark for bill.utility.date.Date
+
+Times sorting and week/month bucketing of random dates, the operations the parse and
+analyze stages perform for every transaction.
+
+    python benchmarks/bench_date.py [n_dates]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bill.utility.date import Date
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<24} {time.perf_counter() - start:>9.4f} s")
+    return result
+
+
+def main(n):
+    random.seed(0)
+    date_strs = [
+        f"{random.randint(1, 12)}/{random.randint(1, 28)}/{random.randint(2015, 2025)}"
+        for _ in range(n)
+    ]
+
+    print(f"{n} dates")
+    dates = timed("parse", lambda: [Date(d) for d in date_strs])
+    timed("sort by to_int", lambda: sorted(dates, key=lambda d: d.to_int()))
+    timed("sort by __lt__", lambda: sorted(dates))
+    timed("bucket by to_week", lambda: {d.to_week() for d in dates})
+    timed("bucket by month", lambda: {(d.year, d.month) for d in dates})
+    timed("since_epoch", lambda: [d.since_epoch() for d in dates])
+    timed("next_week", lambda: [d.next_week() for d in dates])
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
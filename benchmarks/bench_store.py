@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for bill.utility.store
+
+Times loading a transaction history from all_transactions.csv against opening the same
+history from all_transactions.bill.
+
+    python benchmarks/bench_store.py [n_transactions]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bill.analyze.create_doc import read_transactions
+from bill.utility import store
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<24} {time.perf_counter() - start:>9.4f} s")
+    return result
+
+
+def main(n):
+    random.seed(0)
+    vendors = [f"VENDOR {i}" for i in range(500)]
+    categories = [f"category{i % 10}.sub{i}" for i in range(40)]
+    rows = sorted(
+        (
+            (
+                f"{random.randint(1, 12):0>2}/{random.randint(1, 28):0>2}/{y}",
+                f"{random.uniform(1, 500):.2f}",
+                random.choice(vendors),
+                random.choice(categories),
+            )
+            for y in [random.randint(2015, 2025) for _ in range(n)]
+        ),
+        key=lambda r: (r[0][6:], r[0]),
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file = os.path.join(tmp, "all_transactions.csv")
+        bill_file = os.path.join(tmp, "all_transactions.bill")
+
+        with open(csv_file, "w", newline="") as f_stream:
+            csv.writer(f_stream).writerows(rows)
+
+        transactions = read_transactions(csv_file)
+        vendor_codes, vendor_dict = store.encode(
+            [transactions.vendors[c] for c in transactions.vendor_codes]
+        )
+        category_codes, category_dict = store.encode(
+            [transactions.categories[c] for c in transactions.category_codes]
+        )
+        store.write(
+            bill_file,
+            transactions.dates,
+            transactions.amounts,
+            vendor_codes,
+            vendor_dict,
+            category_codes,
+            category_dict,
+            is_sorted=True,
+        )
+
+        print(f"{n} transactions")
+        print(f"csv  {os.path.getsize(csv_file):>12} bytes")
+        print(f"bill {os.path.getsize(bill_file):>12} bytes")
+        timed("read csv", read_transactions, csv_file)
+        opened = timed("open bill", read_transactions, bill_file)
+        timed("sum amounts (bill)", lambda: int(opened.amounts.sum()))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
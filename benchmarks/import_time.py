@@ -0,0 +1,72 @@
+"""
+Startup benchmark for the command line entry points
+
+Times `-h` of each entry point, and a parse run over an empty statement directory, as
+fresh interpreters. Each is also run under -X importtime to list which of the heavy
+dependencies it loaded, which should be none of them.
+
+    python benchmarks/import_time.py [repeats]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HEAVY = ["numpy", "pypdf", "Levenshtein", "xlsxwriter"]
+
+
+def run(args, stdin=""):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=ROOT,
+        input=stdin,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def heavy_imports(args, stdin=""):
+    stderr = run(["-X", "importtime", *args], stdin).stderr
+    loaded = {line.rsplit("|", 1)[-1].strip() for line in stderr.splitlines()}
+    return [name for name in HEAVY if name in loaded]
+
+
+def timed(label, args, repeats, stdin=""):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run(args, stdin)
+        times.append(time.perf_counter() - start)
+
+    loaded = ", ".join(heavy_imports(args, stdin)) or "-"
+    print(f"{label:<28} {statistics.median(times) * 1000:>8.1f} ms   {loaded}")
+
+
+def main(repeats):
+    print(f"{'':<28} {'median':>11}   heavy imports")
+    timed("python -c pass", ["-c", "pass"], repeats)
+    timed("python -m bill.parse -h", ["-m", "bill.parse", "-h"], repeats)
+    timed("python -m bill -h", ["-m", "bill", "-h"], repeats)
+    timed("python -m bill.analyze -h", ["-m", "bill.analyze", "-h"], repeats)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        statements = os.path.join(tmp, "statements")
+        os.mkdir(statements)
+        args = [
+            "-m",
+            "bill.parse",
+            statements,
+            os.path.join(tmp, "out"),
+            os.path.join(tmp, "categories.csv"),
+        ]
+        # Answers the deletion prompt once out exists after the first run
+        timed("bill.parse, no statements", args, repeats, stdin="Y\n")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,82 @@
+import argparse
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m bill",
+        description="Read, categorize and report on bank statements in one run. Currently supports: PNC Bank, Chase, FNB, Discover",
+    )
+
+    parser.add_argument(
+        "statement_dir", type=str, help="Directory containing bank statements"
+    )
+    parser.add_argument(
+        "output_dir",
+        nargs="?",
+        type=str,
+        help="Directory to output all_transactions.csv, bills.xlsx and the rest into. Defaults to ./bill_output",
+        default="./bill_output",
+    )
+    parser.add_argument(
+        "category_file",
+        nargs="?",
+        type=str,
+        help="Directory of categories.csv to use for categorization. Defaults to ./categories.csv",
+        default="./categories.csv",
+    )
+    parser.add_argument(
+        "--xlsx",
+        type=str,
+        help="Workbook to write. Defaults to bills.xlsx in output_dir",
+    )
+    parser.add_argument(
+        "--cube",
+        type=str,
+        help="Rollup cube .npz to keep the week and month totals in",
+    )
+    parser.add_argument(
+        "--constant-memory",
+        action="store_true",
+        help="Stream the workbook's rows to disk instead of keeping it in memory",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running, reading statements as they arrive in statement_dir",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5.0,
+        help="Seconds between checks of statement_dir with --watch. Defaults to 5",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Write the time, CPU and memory of each stage to this .json file",
+    )
+
+    args = parser.parse_args()
+
+    # Imported after parsing so -h doesn't wait on it
+    from . import pipeline, watch
+    from .utility.profile import profiled
+
+    paths = (
+        os.path.abspath(args.statement_dir),
+        os.path.abspath(args.output_dir),
+        os.path.abspath(args.category_file),
+        None if args.xlsx is None else os.path.abspath(args.xlsx),
+        None if args.cube is None else os.path.abspath(args.cube),
+    )
+
+    with profiled(args.profile):
+        if args.watch:
+            watch.watch(*paths, args.constant_memory, args.interval)
+        else:
+            pipeline.run(*paths, args.constant_memory)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,175 @@
-from . import create_doc
+import argparse
+import os
+import sys
+
+from . import aggregate, create_doc, cube, query, stats
+from ..utility.date import Date
+from ..utility import profile
 
 if __name__ == "__main__":
-    CSV = "Z:\\bill_tracker\\bill_output\\all_transactions.csv"
-    FILE = "Z:/bill_tracker/bill_output/bills.xlsx"
+    parser = argparse.ArgumentParser(
+        prog="python -m bill.analyze",
+        description="Report on and query the transactions written by python -m bill",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Write the time, CPU and memory of each stage to this .json file",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_source(subparser):
+        subparser.add_argument(
+            "source",
+            type=str,
+            help="all_transactions.bill, all_transactions.csv, or a history directory",
+        )
+
+    def add_filters(subparser):
+        subparser.add_argument(
+            "--start", type=Date, help="First date, mm/dd/yyyy, inclusive"
+        )
+        subparser.add_argument(
+            "--end", type=Date, help="Last date, mm/dd/yyyy, inclusive"
+        )
+        subparser.add_argument(
+            "--category", type=str, help="Only this category and its subcategories"
+        )
+
+    def add_format(subparser):
+        subparser.add_argument(
+            "--format",
+            choices=["csv", "json"],
+            default="csv",
+            help="Output format. Defaults to csv",
+        )
+        subparser.add_argument(
+            "-o", "--output", type=str, help="File to write to. Defaults to stdout"
+        )
+
+    xlsx = subparsers.add_parser("xlsx", help="Write the spending report workbook")
+    add_source(xlsx)
+    xlsx.add_argument("xlsx_file", type=str, help="Workbook, or directory with --split")
+    xlsx.add_argument("--start", type=Date, help="First date, mm/dd/yyyy, inclusive")
+    xlsx.add_argument("--end", type=Date, help="Last date, mm/dd/yyyy, inclusive")
+    xlsx.add_argument(
+        "--cube",
+        type=str,
+        help="Rollup cube .npz to keep the week and month totals in",
+    )
+    xlsx.add_argument(
+        "--split",
+        choices=create_doc.SPLITS,
+        help="Write one workbook per year or top-level category, in parallel",
+    )
+    xlsx.add_argument(
+        "--constant-memory",
+        action="store_true",
+        help="Stream rows to disk instead of keeping the workbook in memory",
+    )
+    xlsx.add_argument(
+        "--formulas",
+        action="store_true",
+        help="Write the month statistics as Excel formulas instead of values",
+    )
+    xlsx.add_argument(
+        "--stat-months",
+        nargs="+",
+        default=stats.DEFAULT_MONTHS,
+        help="mm/yyyy months the month statistics start from",
+    )
+
+    totals = subparsers.add_parser(
+        "totals", help="Total spending by period and category"
+    )
+    add_source(totals)
+    add_filters(totals)
+    totals.add_argument(
+        "--by",
+        choices=aggregate.GRANULARITIES,
+        default="month",
+        help="Period to total by. Defaults to month",
+    )
+    totals.add_argument(
+        "--cube",
+        type=str,
+        help="Rollup cube .npz to read totals from, updated with new transactions",
+    )
+    add_format(totals)
+
+    top_vendors = subparsers.add_parser(
+        "top-vendors", help="Vendors with the most spending"
+    )
+    add_source(top_vendors)
+    add_filters(top_vendors)
+    top_vendors.add_argument(
+        "-n", type=int, default=10, help="Number of vendors. Defaults to 10"
+    )
+    add_format(top_vendors)
+
+    transactions = subparsers.add_parser(
+        "transactions", help="List the transactions matching filters"
+    )
+    add_source(transactions)
+    add_filters(transactions)
+    transactions.add_argument(
+        "--vendor", type=str, help="Case-insensitive substring of the vendor"
+    )
+    transactions.add_argument("--min", type=str, help="Smallest amount, inclusive")
+    transactions.add_argument("--max", type=str, help="Largest amount, inclusive")
+    add_format(transactions)
+
+    args = parser.parse_args()
+    with profile.profiled(args.profile):
+        source = os.path.abspath(args.source)
+
+        if args.command == "xlsx":
+            options = (args.constant_memory, args.stat_months, args.formulas)
+
+            if args.split is not None:
+                create_doc.create_split_xlsx(
+                    source, os.path.abspath(args.xlsx_file), args.split, None, *options
+                )
+            else:
+                create_doc.create_xlsx(
+                    source,
+                    os.path.abspath(args.xlsx_file),
+                    args.cube,
+                    *options,
+                    args.start,
+                    args.end,
+                )
+            sys.exit()
+
+        if (
+            args.command == "totals"
+            and args.cube is not None
+            and args.by in cube.GRANULARITIES
+        ):
+            # Only partitions of source that changed since the cube was saved are read
+            with profile.span("query"):
+                rows = query.cube_totals(
+                    source, args.cube, args.by, args.category, args.start, args.end
+                )
+        else:
+            with profile.span("read"):
+                data = create_doc.read_transactions(
+                    source, args.start, args.end, args.category
+                )
+
+            with profile.span("query", rows=len(data)):
+                if args.command == "totals":
+                    rows = query.totals(data, args.by, args.category)
+                elif args.command == "top-vendors":
+                    rows = query.top_vendors(data, args.n)
+                else:
+                    selected = data.query(
+                        vendor=args.vendor, min_amount=args.min, max_amount=args.max
+                    )
+                    rows = query.transaction_rows(selected)
 
-    create_doc.create_xlsx(CSV, FILE)
+        if args.output is None:
+            query.write_rows(rows, args.format, sys.stdout)
+        else:
+            with open(args.output, "w", newline="") as f_stream:
+                query.write_rows(rows, args.format, f_stream)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from ..utility.lazy import lazy_import
+from ..utility.date import Date, week_keys, month_keys, quarter_keys, year_keys
+
+np = lazy_import("numpy")
+
+GRANULARITIES = ["day", "week", "month", "quarter", "year"]
+
+
+def period_keys(ordinals: np.ndarray, granularity: str):
+    """
+    Returns the integer period key of each day number and the step between periods
+
+    Args:
+        ordinals (np.ndarray): Day numbers (Date.to_int())
+        granularity (str): One of GRANULARITIES
+
+    Returns:
+        tuple: (keys, step)
+    """
+
+    if granularity == "day":
+        return np.asarray(ordinals, dtype=np.int32), 1
+    elif granularity == "week":
+        return week_keys(ordinals), 7
+    elif granularity == "month":
+        return month_keys(ordinals), 1
+    elif granularity == "quarter":
+        return quarter_keys(ordinals), 1
+    elif granularity == "year":
+        return year_keys(ordinals), 1
+
+    raise ValueError(f"Unknown granularity {granularity}")
+
+
+def period_label(key: int, granularity: str) -> str:
+    """
+    Returns the header label of a period key, matching the Transactions.by_* keys
+    """
+
+    if granularity in ["day", "week"]:
+        return str(Date.from_int(key))
+    elif granularity == "month":
+        return f"{key % 12 + 1:0>2}/{key // 12:0>4}"
+    elif granularity == "quarter":
+        return f"Q{key % 4 + 1}/{key // 4:0>4}"
+    elif granularity == "year":
+        return f"{key:0>4}"
+
+    raise ValueError(f"Unknown granularity {granularity}")
+
+
+def ancestor_matrix(categories: list[str], order: dict[str, int]) -> np.ndarray:
+    """
+    Build the matrix rolling leaf categories up to every column they count towards
+
+    Args:
+        categories (list[str]): Category string by category code
+        order (dict[str, int]): Column of each category and ancestor category.
+            Categories missing from order get no column.
+
+    Returns:
+        np.ndarray: (len(categories), len(order)) matrix, 1 where the column is the
+            category itself or one of its ancestors
+    """
+
+    matrix = np.zeros((len(categories), len(order)), dtype=np.int64)
+
+    for code, category in enumerate(categories):
+        sub_cats = category.split(".")
+        while len(sub_cats) > 0:
+            column = order.get(".".join(sub_cats))
+            if column is not None:
+                matrix[code, column] = 1
+            sub_cats = sub_cats[:-1]
+
+    return matrix
+
+
+def period_data(transactions, order: dict[str, int], granularity: str):
+    """
+    Total spending per period and category, including ancestor categories
+
+    Each transaction gets a period code and a leaf category code once. Leaf totals are
+    summed exactly in integer cents with a single scatter-add, then rolled up to
+    ancestors with one product against the ancestor matrix. Periods without
+    transactions between the first and last are included as zero rows.
+
+    Args:
+        transactions (Transactions | TransactionsView): Transactions to total
+        order (dict[str, int]): Column of each category and ancestor category
+        granularity (str): One of GRANULARITIES
+
+    Returns:
+        tuple: (header, data) where header labels each period and data is a
+            (periods, len(order)) int64 array of totals in cents
+    """
+
+    keys, step = period_keys(transactions.dates, granularity)
+    if len(keys) == 0:
+        return [], np.zeros((0, len(order)), np.int64)
+
+    first = int(keys.min())
+    periods = (keys - first) // step
+    n_periods = int(periods.max()) + 1
+    n_leaves = len(transactions.categories)
+
+    cells = periods.astype(np.int64) * n_leaves + transactions.category_codes
+    leaf_data = np.zeros(n_periods * n_leaves, dtype=np.int64)
+    np.add.at(leaf_data, cells, transactions.amounts)
+    leaf_data = leaf_data.reshape(n_periods, n_leaves)
+
+    data = leaf_data @ ancestor_matrix(transactions.categories, order)
+    header = [period_label(first + i * step, granularity) for i in range(n_periods)]
+
+    return header, data
@@ -1,12 +1,22 @@
+from __future__ import annotations
+
 import csv
-import xlsxwriter
-from xlsxwriter.utility import xl_rowcol_to_cell as cell_name
 import os
-import numpy as np
 
-from ..utility import helpers
-from ..utility.date import Date
+from ..utility import helpers, partition, profile, store
+from ..utility.lazy import lazy_import
+from ..utility.date import Date, day_number, since_epoch, year_keys
+from ..utility.money import Money
 from .transactions import Transactions
+from . import aggregate, stats
+from .cube import RollupCube, period_bounds
+from .recurring import RecurringCharge, find_recurring
+from .rolling import RollingSpend
+
+xlsxwriter = lazy_import("xlsxwriter")
+np = lazy_import("numpy")
+
+SPLITS = ["year", "category"]
 
 
 def add_category(struct: dict, category: str):
@@ -83,214 +93,738 @@ def ordered_header(struct: dict):
 
 
 def week_data(transactions: Transactions, categories: dict):
-    raw_data = transactions.by_week()
-    n_weeks = len(raw_data.keys())
-
-    data_header: list = [""] * n_weeks
-    data = np.zeros((n_weeks, len(categories)), float)
-
-    for i, week in enumerate(raw_data):
-        data_header[i] = str(week)
-
-        cat_ind = 0
-
-        for transaction in raw_data[week]:
-            amount, category = (
-                transaction["amount"],
-                transaction["category"],
-            )
-
-            sub_cats = category.split(".")
-            while len(sub_cats) > 0:
-                cat_ind = categories[".".join(sub_cats)]
-                data[i, cat_ind] += amount
-                sub_cats = sub_cats[:-1]
-
-    return data_header, data
+    return aggregate.period_data(transactions, categories, "week")
 
 
 def month_data(transactions: Transactions, categories: dict):
-    raw_data = transactions.by_month()
-    n_months = len(raw_data.keys())
-
-    data_header: list = [""] * n_months
-    data = np.zeros((n_months, len(categories)), float)
+    return aggregate.period_data(transactions, categories, "month")
 
-    for i, month in enumerate(raw_data):
-        data_header[i] = month
-
-        cat_ind = 0
-
-        for transaction in raw_data[month]:
-            amount, category = (
-                transaction["amount"],
-                transaction["category"],
-            )
 
-            sub_cats = category.split(".")
-            while len(sub_cats) > 0:
-                cat_ind = categories[".".join(sub_cats)]
-                data[i, cat_ind] += amount
-                sub_cats = sub_cats[:-1]
+def fit_columns(sheet, widths: list[int], formats: dict = {}):
+    """
+    Autofit a sheet's columns, or in constant_memory mode, where cells aren't kept for
+    autofit, set them to the given widths in characters, keeping their column formats
+    """
 
-    return data_header, data
+    if sheet.constant_memory:
+        for col, width in enumerate(widths):
+            sheet.set_column(col, col, width, formats.get(col))
+    else:
+        sheet.autofit()
 
 
 def category_sheet(
     workbook: xlsxwriter.Workbook,
     category: str,
     category_transactions: dict[str, Transactions],
+    date_format: xlsxwriter.format.Format | None = None,
 ):
-    date_format = workbook.add_format({"num_format": "mm/dd/yyyy;@"})
+    if date_format is None:
+        date_format = workbook.add_format({"num_format": "mm/dd/yyyy;@"})
     sheet = workbook.add_worksheet(category)
 
     transactions = category_transactions[category]
 
-    header = ["Date", "Amount", "Vendor"]
-    header_keys = ["date", "amount", "vendor"]
+    # Columns are converted in bulk, and dates get their format from the column
+    serials = since_epoch(transactions.dates).tolist()
+    amounts = (transactions.amounts / 100).tolist()
+    vendors = [transactions.vendors[c] for c in transactions.vendor_codes.tolist()]
+
+    sheet.set_column(0, 0, None, date_format)
+    sheet.write_row(0, 0, ["Date", "Amount", "Vendor"])
+
+    for i, row in enumerate(zip(serials, amounts, vendors)):
+        sheet.write_row(i + 1, 0, row)
+
+    vendor_width = max((len(v) for v in vendors), default=6)
+    fit_columns(sheet, [11, 10, vendor_width + 1], {0: date_format})
+
+
+def recurring_sheet(workbook: xlsxwriter.Workbook, recurring: list[RecurringCharge]):
+    date_format = workbook.add_format({"num_format": "mm/dd/yyyy;@"})
+    sheet = workbook.add_worksheet("Recurring Charges")
+
+    header = [
+        "Vendor",
+        "Frequency",
+        "Charges",
+        "Typical Amount",
+        "Last Amount",
+        "Previous Amount",
+        "First",
+        "Last",
+        "Next Due",
+        "Missed",
+        "Overdue",
+        "Price Increase",
+    ]
+    header_keys = [
+        "vendor",
+        "frequency",
+        "charges",
+        "typical_amount",
+        "last_amount",
+        "previous_amount",
+        "first",
+        "last",
+        "next_due",
+        "missed",
+        "overdue",
+        "price_increase",
+    ]
 
     for i, data in enumerate(header):
         sheet.write(0, i, data)
 
-    for i, transaction in enumerate(transactions):
+    for i, charge in enumerate(recurring):
         for j, key in enumerate(header_keys):
-            if isinstance(transaction[key], Date):
-                sheet.write(i + 1, j, transaction[key].since_epoch(), date_format)
+            if isinstance(charge[key], Date):
+                sheet.write(i + 1, j, charge[key].since_epoch(), date_format)
+            elif isinstance(charge[key], Money):
+                sheet.write(i + 1, j, charge[key].to_float())
             else:
-                sheet.write(i + 1, j, transaction[key])
+                sheet.write(i + 1, j, charge[key])
 
-    sheet.autofit()
+    fit_columns(
+        sheet,
+        [max([len(h) for h in header] + [len(c["vendor"]) for c in recurring]) + 1]
+        + [15] * (len(header) - 1),
+    )
 
 
-def create_xlsx(csv_file: str, xlsx_file: str):
-    categories = {}
-    transactions = Transactions()
+STAT_HEADER = [
+    "Average (From {month})",
+    "Confidence Interval",
+]
 
-    with open(csv_file, "r") as f_stream:
-        reader = csv.reader(f_stream)
+ROLLING_DAYS = [30, 90]
+ROLLING_HEADER = [
+    "Last {days} Days",
+    "Daily Average (Last {days} Days)",
+    "Change From Prior {days} Days",
+]
 
-        for line in reader:
-            date, amount, vendor, category = line
 
-            transactions.add_transaction(date, amount, vendor, category)
+def month_statistics(
+    month_header: list[str], data: np.ndarray, months: list[str] = stats.DEFAULT_MONTHS
+):
+    """
+    Average and 95% confidence interval of each category from each start month
 
-            struct = add_category(categories, category)
-            struct["*"].append((date, amount))
+    Args:
+        month_header (list[str]): Label of each month column
+        data (np.ndarray): (months, categories) totals in cents
+        months (list[str]): "mm/yyyy" start months. A month missing from month_header
+            starts from the first month.
 
-    transactions.sort()
+    Returns:
+        tuple: (header, values) where values[j] holds the statistics of category j
+            in dollars
+    """
 
-    category_header = padded_header_section(categories)
-    category_order = ordered_header(categories)
+    starts = stats.window_starts(month_header, months)
+    mean, _, interval = stats.window_stats(data, starts)
 
-    week_header, data_by_week = week_data(transactions, category_order)
-    month_header, data_by_month = month_data(transactions, category_order)
-    data_by_category = transactions.by_category()
+    header = [h.format(month=month) for month in months for h in STAT_HEADER]
 
-    try:
-        os.remove(xlsx_file)
-    except:
-        pass
+    # Alternate the mean and interval of each window, by category
+    values = np.stack((mean, interval), axis=1).reshape(-1, data.shape[1]) / 100
 
-    workbook = xlsxwriter.Workbook(xlsx_file)
-    money_format = workbook.add_format(
-        {"num_format": '_($* #,##0.00_);_($* (#,##0.00);_($* " - "??_);_(@_)'}
-    )
-    header_format = workbook.add_format(
-        {"bold": True, "font_color": "#FFFFFF", "bg_color": "#303030"}
+    return header, values.T.tolist()
+
+
+def month_formulas(
+    month_header: list[str],
+    n_cats: int,
+    label_cols: int,
+    months: list[str] = stats.DEFAULT_MONTHS,
+):
+    """
+    The formulas month_statistics() computes, for auditing the values in Excel
+
+    Args:
+        month_header (list[str]): Label of each month column
+        n_cats (int): Number of category rows
+        label_cols (int): Number of category label columns before the data
+        months (list[str]): "mm/yyyy" start months
+
+    Returns:
+        tuple: (header, formulas) where formulas[j] holds the formulas of category j
+    """
+
+    from xlsxwriter.utility import xl_rowcol_to_cell as cell_name
+
+    formula_equations = [
+        "=AVERAGE({start_cell}:{end_cell})",
+        "=CONFIDENCE(0.05, STDEV({start_cell}:{end_cell}), COUNT({start_cell}:{end_cell}))",
+    ]
+    n_months = len(month_header)
+    row_off = 1
+
+    header = [h.format(month=month) for month in months for h in STAT_HEADER]
+    formulas: list[list[str]] = [[] for _ in range(n_cats)]
+
+    for start_col in stats.window_starts(month_header, months):
+        for j in range(n_cats):
+            start_cell = cell_name(row_off + j, start_col + label_cols)
+            end_cell = cell_name(row_off + j, n_months + label_cols - 1)
+
+            for formula in formula_equations:
+                formulas[j].append(
+                    formula.format(start_cell=start_cell, end_cell=end_cell)
+                )
+
+    return header, formulas
+
+
+def rolling_statistics(rolling: RollingSpend, windows: list[int] = ROLLING_DAYS):
+    """
+    Spending of each category over the trailing windows ending on the last day
+
+    Args:
+        rolling (RollingSpend): Rolling spending of the transactions
+        windows (list[int]): Days in each window
+
+    Returns:
+        tuple: (header, values) where values[j] holds the statistics of category j
+            in dollars
+    """
+
+    header = [h.format(days=days) for days in windows for h in ROLLING_HEADER]
+    if len(rolling) == 0:
+        return header, [[0.0] * len(header) for _ in rolling.order]
+
+    # Total, daily average and change of each window, by category
+    values = np.stack(
+        [
+            query[-1]
+            for days in windows
+            for query in (
+                rolling.trailing(days),
+                rolling.moving_average(days),
+                rolling.delta(days),
+            )
+        ],
+        axis=1,
     )
-    sheet_by_week = workbook.add_worksheet("Category Spending By Week")
-    sheet_by_month = workbook.add_worksheet("Category Spending By Month")
+
+    return header, (values / 100).tolist()
+
+
+def period_sheet(
+    sheet,
+    category_header: list[list[str | None]],
+    period_header: list[str],
+    data: np.ndarray,
+    header_format,
+    money_format,
+    extra_header: list[str] = [],
+    extra: list[list] | None = None,
+):
+    """
+    Write a period x category matrix with categories down the rows, one whole row at a
+    time in row order, so it can be streamed in constant_memory mode
+
+    Args:
+        sheet (Worksheet): Sheet to write to
+        category_header (list[list[str | None]]): padded_header_section()
+        period_header (list[str]): Label of each period
+        data (np.ndarray): (periods, categories) totals in cents
+        header_format (Format): Format of the category labels and extra header
+        money_format (Format): Format of the totals and extra columns
+        extra_header (list[str]): Header of columns written after the totals
+        extra (list[list] | None): Values or formulas of the extra columns, by
+            category
+    """
 
     row_off, col_off = 1, len(category_header[0])
+    extra_off = col_off + len(period_header) + 2
+
+    sheet.write_row(0, col_off, period_header)
+    sheet.write_row(0, extra_off, extra_header, header_format)
+
+    # Dollars by category row
+    rows = (data.T / 100).tolist()
 
-    # Category Header
     for ri, row in enumerate(category_header):
         ci = 0
         while row[ci] is None:
             ci += 1
 
+        r = ri + row_off
         if len(row) - ci > 2:
-            sheet_by_week.merge_range(
-                ri + row_off, ci, ri + row_off, len(row) - 1, row[ci], header_format
-            )
-            sheet_by_month.merge_range(
-                ri + row_off, ci, ri + row_off, len(row) - 1, row[ci], header_format
-            )
+            sheet.merge_range(r, ci, r, len(row) - 1, row[ci], header_format)
+        else:
+            sheet.write(r, ci, row[ci], header_format)
+
+        sheet.write_row(r, col_off, rows[ri], money_format)
+        if extra is not None:
+            sheet.write_row(r, extra_off, extra[ri], money_format)
+
+    sheet.freeze_panes(1, col_off)
+
+
+def read_transactions(
+    transactions_file: str,
+    start: Date | str | None = None,
+    end: Date | str | None = None,
+    category: str | None = None,
+) -> Transactions:
+    """
+    Read transactions in date order from all_transactions.csv, open them from the
+    binary all_transactions.bill without copying, or read them from the partitions of
+    a history directory that overlap start and end
+
+    Args:
+        transactions_file (str): Path of the .csv or .bill file, or history directory
+        start (Date | str | None): First date, inclusive
+        end (Date | str | None): Last date, inclusive
+        category (str | None): Only read this category and its subcategories
+
+    Returns:
+        Transactions: The transactions, with categories coded in order of first
+            appearance
+    """
+
+    first = None if start is None else day_number(start)
+    last = None if end is None else day_number(end)
+
+    if os.path.isdir(transactions_file):
+        columns = partition.read(transactions_file, first, last, category)
+        transactions = Transactions.from_columns(**columns)
+        if category is None:
+            return transactions
+
+    elif helpers.file_extension(transactions_file) == "bill":
+        columns, metadata = store.read(transactions_file)
+        transactions = Transactions.from_columns(**columns)
+
+        if not metadata["sorted"]:
+            transactions.sort()
+    else:
+        transactions = Transactions()
+        with open(transactions_file, "r") as f_stream:
+            columns = [list(column) for column in zip(*csv.reader(f_stream))]
+
+        if len(columns) > 0:
+            transactions.extend(*columns)
+
+        transactions.sort()
+
+    if first is None and last is None and category is None:
+        return transactions
+
+    return _select(transactions, first, last, category)
+
+
+def _select(
+    transactions: Transactions,
+    first: int | None = None,
+    last: int | None = None,
+    category: str | None = None,
+) -> Transactions:
+    """
+    Transactions dated first to last, inclusive, in category or its subcategories,
+    with categories re-coded in order of first appearance
+    """
+
+    dates = transactions.dates
+    selected = np.ones(len(dates), bool)
+    if first is not None:
+        selected &= dates >= first
+    if last is not None:
+        selected &= dates <= last
+    if category is not None:
+        codes = [
+            code
+            for code, c in enumerate(transactions.categories)
+            if c == category or c.startswith(f"{category}.")
+        ]
+        selected &= np.isin(transactions.category_codes, codes)
+
+    # Re-encode so categories are coded in order of first appearance in the selection
+    taken = transactions.take(np.flatnonzero(selected))
+    return Transactions.from_columns(
+        taken.dates,
+        taken.amounts,
+        *store.encode([taken.vendors[c] for c in taken.vendor_codes.tolist()]),
+        *store.encode([taken.categories[c] for c in taken.category_codes.tolist()]),
+    )
+
 
+def write_workbook(
+    transactions: Transactions,
+    xlsx_file: str,
+    cube_file: str | None = None,
+    constant_memory: bool = False,
+    stat_months: list[str] = stats.DEFAULT_MONTHS,
+    formulas: bool = False,
+    cube: RollupCube | None = None,
+    start: Date | str | None = None,
+    end: Date | str | None = None,
+):
+    """
+    Write the spending report workbook of transactions
+
+    Args:
+        transactions (Transactions): Transactions in date order
+        xlsx_file (str): Path of the workbook, replaced if it exists
+        cube_file (str | None): RollupCube to update and read the week and month
+            totals from, instead of totaling transactions
+        constant_memory (bool): Stream rows to disk instead of keeping the workbook in
+            memory
+        stat_months (list[str]): "mm/yyyy" months the statistics start from
+        formulas (bool): Write the statistics as Excel formulas instead of values
+        cube (RollupCube | None): Up to date cube to read the week and month totals
+            from, used instead of cube_file
+        start (Date | str | None): First date of the cube totals, which are read in
+            whole weeks and months
+        end (Date | str | None): Last date of the cube totals
+    """
+
+    with profile.span("export.workbook", rows=len(transactions)):
+        categories = {}
+        for category in transactions.categories:
+            add_category(categories, category)
+
+        category_header = padded_header_section(categories)
+        category_order = ordered_header(categories)
+
+        if cube is None and cube_file is not None:
+            # Only months whose transactions changed are recounted
+            cube = RollupCube.load(cube_file)
+            if cube.update(transactions) > 0:
+                cube.save(cube_file)
+
+        if cube is None:
+            week_header, data_by_week = week_data(transactions, category_order)
+            month_header, data_by_month = month_data(transactions, category_order)
         else:
-            sheet_by_week.write(ri + row_off, ci, row[ci], header_format)
-            sheet_by_month.write(ri + row_off, ci, row[ci], header_format)
-
-    # Data Writing
-    for ci, data in enumerate(week_header):
-        sheet_by_week.write(0, ci + col_off, data)
-    for ci, data in enumerate(month_header):
-        sheet_by_month.write(0, ci + col_off, data)
-
-    for i in range(data_by_week.shape[0]):
-        for j in range(data_by_week.shape[1]):
-            sheet_by_week.write(
-                row_off + j, col_off + i, data_by_week[i, j], money_format
+            week_header, data_by_week, _ = cube.matrix(
+                "week", category_order, *period_bounds("week", start, end)
             )
-
-    for i in range(data_by_month.shape[0]):
-        for j in range(data_by_month.shape[1]):
-            sheet_by_month.write(
-                row_off + j, col_off + i, data_by_month[i, j], money_format
+            month_header, data_by_month, _ = cube.matrix(
+                "month", category_order, *period_bounds("month", start, end)
+            )
+        data_by_category = transactions.by_category()
+
+        try:
+            os.remove(xlsx_file)
+        except:
+            pass
+
+        # Statistics of windows too short to have them are written as Excel errors
+        workbook = xlsxwriter.Workbook(
+            xlsx_file, {"constant_memory": constant_memory, "nan_inf_to_errors": True}
+        )
+        money_format = workbook.add_format(
+            {"num_format": '_($* #,##0.00_);_($* (#,##0.00);_($* " - "??_);_(@_)'}
+        )
+        header_format = workbook.add_format(
+            {"bold": True, "font_color": "#FFFFFF", "bg_color": "#303030"}
+        )
+        date_format = workbook.add_format({"num_format": "mm/dd/yyyy;@"})
+
+        sheet_by_week = workbook.add_worksheet("Category Spending By Week")
+        sheet_by_month = workbook.add_worksheet("Category Spending By Month")
+
+        label_cols = len(category_header[0])
+        if formulas:
+            stat_header, stat_values = month_formulas(
+                month_header, len(category_order), label_cols, stat_months
+            )
+        else:
+            stat_header, stat_values = month_statistics(
+                month_header, data_by_month, stat_months
             )
 
-    for category in category_order:
-        category_sheet(workbook, category, data_by_category)
-
-    # Write Formulas
-
-    row_off, col_off = 1, len(category_header[0]) + data_by_month.shape[0] + 2
+        roll_header, roll_values = rolling_statistics(
+            RollingSpend(transactions, category_order)
+        )
+        stat_header += roll_header
+        stat_values = [
+            stat + roll for stat, roll in zip(stat_values, roll_values, strict=True)
+        ]
+
+        period_sheet(
+            sheet_by_week,
+            category_header,
+            week_header,
+            data_by_week,
+            header_format,
+            money_format,
+        )
+        period_sheet(
+            sheet_by_month,
+            category_header,
+            month_header,
+            data_by_month,
+            header_format,
+            money_format,
+            stat_header,
+            stat_values,
+        )
+        fit_columns(
+            sheet_by_month,
+            [12] * (label_cols + len(month_header) + 1) + [24] * len(stat_header),
+        )
+
+        for category in category_order:
+            category_sheet(workbook, category, data_by_category, date_format)
+
+        recurring_sheet(workbook, find_recurring(transactions))
+
+        workbook.close()
+
+
+def create_xlsx(
+    csv_file: str,
+    xlsx_file: str,
+    cube_file: str | None = None,
+    constant_memory: bool = False,
+    stat_months: list[str] = stats.DEFAULT_MONTHS,
+    formulas: bool = False,
+    start: Date | str | None = None,
+    end: Date | str | None = None,
+):
+    if cube_file is None:
+        with profile.span("read") as span:
+            transactions = read_transactions(csv_file, start, end)
+            span.count(rows=len(transactions))
+
+        write_workbook(
+            transactions, xlsx_file, None, constant_memory, stat_months, formulas
+        )
+        return
+
+    # The cube is kept up to date with the whole history, then only read between start
+    # and end, and the rows are read from just the partitions overlapping them
+    cube, _ = load_cube(cube_file, csv_file)
+    with profile.span("read") as span:
+        transactions = read_transactions(history_dir(csv_file) or csv_file, start, end)
+        span.count(rows=len(transactions))
+
+    write_workbook(
+        transactions,
+        xlsx_file,
+        None,
+        constant_memory,
+        stat_months,
+        formulas,
+        cube,
+        start,
+        end,
+    )
 
-    formula_header = [
-        "Average (From {month})",
-        "Confidence Interval",
-    ]
-    formula_equations = [
-        "=AVERAGE({start_cell}:{end_cell})",
-        "=CONFIDENCE(0.05, STDEV({start_cell}:{end_cell}), COUNT({start_cell}:{end_cell}))",
-    ]
-    months = ["09/2022", "09/2023", "09/2024", "02/2025"]
-    n_months, n_cats = data_by_month.shape
 
-    for month in months:
-        for k in range(len(formula_header)):
-            sheet_by_month.write(
-                0, col_off + k, formula_header[k].format(month=month), header_format
+def history_dir(source: str) -> str | None:
+    """
+    Returns the history directory holding source's transactions: source itself if it's
+    a directory, or the history directory written next to all_transactions.bill or
+    .csv. None if there is none.
+    """
+
+    if os.path.isdir(source):
+        return source
+
+    history = os.path.join(os.path.dirname(source), "history")
+    if os.path.isfile(os.path.join(history, partition.INDEX_FILE)):
+        return history
+    return None
+
+
+def load_cube(
+    cube_file: str, source: str, transactions: Transactions | None = None
+) -> tuple[RollupCube, list[str]]:
+    """
+    Load a RollupCube and bring it up to date with source, saving it if it changed
+
+    When source has a history directory, the cube's partition digests are checked
+    against its index and only the changed partitions are read, so a cube that is
+    already up to date answers without reading the transactions. Otherwise source is
+    read whole, unless its transactions are given.
+
+    Args:
+        cube_file (str): Path of the cube
+        source (str): Path of the .csv or .bill file, or history directory
+        transactions (Transactions | None): All of source's transactions, if already
+            read
+
+    Returns:
+        tuple: (cube, categories) with the leaf categories of source in order of first
+            appearance, as read_transactions codes them
+    """
+
+    cube = RollupCube.load(cube_file)
+
+    history = history_dir(source)
+    with profile.span("cube.update") as span:
+        if history is not None:
+            index = partition.read_index(history)
+            changed = cube.sync(history, index)
+            categories = list(
+                dict.fromkeys(
+                    category
+                    for key in sorted(index["partitions"])
+                    for category in index["partitions"][key]["categories"]
+                )
             )
+        else:
+            if transactions is None:
+                transactions = read_transactions(source)
+            changed = cube.update(transactions)
+            categories = transactions.categories
+        span.count(partitions=changed)
+
+    if changed > 0:
+        cube.save(cube_file)
+
+    return cube, categories
+
+
+def create_split_xlsx(
+    transactions_file: str,
+    out_dir: str,
+    split: str = "year",
+    workers: int | None = None,
+    constant_memory: bool = False,
+    stat_months: list[str] = stats.DEFAULT_MONTHS,
+    formulas: bool = False,
+) -> list[str]:
+    """
+    Write the report as one workbook per year or per top-level category, in parallel,
+    plus index.xlsx linking to each of them
+
+    Every worker process reads its part from the same memory-mapped .bill file or
+    history directory. Other inputs are first written to a temporary .bill file.
+
+    Args:
+        transactions_file (str): Path of the .csv or .bill file, or history directory
+        out_dir (str): Directory for the workbooks, created if needed
+        split (str): One of SPLITS
+        workers (int | None): Number of worker processes, defaulting to one per core
+        constant_memory (bool): As write_workbook
+        stat_months (list[str]): As write_workbook
+        formulas (bool): As write_workbook
+
+    Returns:
+        list[str]: Paths of the workbooks written, index.xlsx last
+    """
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    transactions = read_transactions(transactions_file)
+    os.makedirs(out_dir, exist_ok=True)
+
+    if split == "year":
+        years = np.unique(year_keys(transactions.dates)).tolist()
+        parts = [(f"{y:0>4}", f"01/01/{y:0>4}", f"12/31/{y:0>4}", None) for y in years]
+    elif split == "category":
+        tops = dict.fromkeys(c.split(".")[0] for c in transactions.categories)
+        parts = [(top, None, None, top) for top in tops]
+    else:
+        raise ValueError(f"Unknown split {split}")
+
+    shared = transactions_file
+    tmp = None
+    if not os.path.isdir(shared) and helpers.file_extension(shared) != "bill":
+        tmp = os.path.join(out_dir, ".all_transactions.bill")
+        store.write(
+            tmp,
+            transactions.dates,
+            transactions.amounts,
+            transactions.vendor_codes,
+            transactions.vendors,
+            transactions.category_codes,
+            transactions.categories,
+            is_sorted=True,
+        )
+        shared = tmp
 
-        # Find data start
-        start_col = 0
+    try:
+        with profile.span("export.split", workbooks=len(parts)), ProcessPoolExecutor(
+            workers
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _write_part,
+                    shared,
+                    os.path.join(out_dir, f"{name}.xlsx"),
+                    start,
+                    end,
+                    category,
+                    constant_memory,
+                    stat_months,
+                    formulas,
+                )
+                for name, start, end, category in parts
+            ]
+            summaries = [future.result() for future in futures]
+    finally:
+        if tmp is not None:
+            os.remove(tmp)
+
+    index_file = os.path.join(out_dir, "index.xlsx")
+    index_workbook(index_file, [name for name, *_ in parts], summaries)
+
+    return [os.path.join(out_dir, f"{name}.xlsx") for name, *_ in parts] + [index_file]
+
+
+def _write_part(
+    transactions_file, xlsx_file, start, end, category, *options
+) -> tuple[int, int, int, int]:
+    """
+    Write one workbook of create_split_xlsx in a worker process
+
+    Returns:
+        tuple: (rows, total cents, first day, last day) of the part
+    """
+
+    transactions = read_transactions(transactions_file, start, end, category)
+    write_workbook(transactions, xlsx_file, None, *options)
+
+    dates = transactions.dates
+    return (
+        len(transactions),
+        int(transactions.amounts.sum()),
+        int(dates[0]),
+        int(dates[-1]),
+    )
 
-        for c, m in enumerate(month_header):
-            if m == month:
-                start_col = c
-                break
-        # End find data start
 
-        for j in range(n_cats):
+def index_workbook(
+    xlsx_file: str, names: list[str], summaries: list[tuple[int, int, int, int]]
+):
+    """
+    Write a workbook linking to the workbooks of create_split_xlsx, which are in the
+    same directory
+    """
 
-            for k, formula in enumerate(formula_equations):
-                f_cell = (row_off + j, col_off + k)
+    try:
+        os.remove(xlsx_file)
+    except:
+        pass
 
-                start_cell = cell_name(row_off + j, start_col + len(category_header[0]))
-                end_cell = cell_name(
-                    row_off + j, n_months + len(category_header[0]) - 1
-                )
+    workbook = xlsxwriter.Workbook(xlsx_file)
+    money_format = workbook.add_format(
+        {"num_format": '_($* #,##0.00_);_($* (#,##0.00);_($* " - "??_);_(@_)'}
+    )
+    header_format = workbook.add_format(
+        {"bold": True, "font_color": "#FFFFFF", "bg_color": "#303030"}
+    )
+    date_format = workbook.add_format({"num_format": "mm/dd/yyyy;@"})
+    sheet = workbook.add_worksheet("Index")
 
-                sheet_by_month.write_formula(
-                    *f_cell,
-                    formula.format(start_cell=start_cell, end_cell=end_cell),
-                    money_format
-                )
+    sheet.write_row(
+        0, 0, ["Workbook", "Transactions", "Total", "First", "Last"], header_format
+    )
 
-        col_off += len(formula_header)
+    for i, (name, (rows, total, first, last)) in enumerate(zip(names, summaries)):
+        sheet.write_url(i + 1, 0, f"external:{name}.xlsx", string=name)
+        sheet.write(i + 1, 1, rows)
+        sheet.write(i + 1, 2, total / 100, money_format)
+        sheet.write(i + 1, 3, Date.from_int(first).since_epoch(), date_format)
+        sheet.write(i + 1, 4, Date.from_int(last).since_epoch(), date_format)
 
-    sheet_by_month.freeze_panes(1, len(category_header[0]))
-    sheet_by_week.freeze_panes(1, len(category_header[0]))
-    sheet_by_month.autofit()
+    sheet.autofit()
     workbook.close()
@@ -0,0 +1,415 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import zipfile
+
+from ..utility import partition, store
+from ..utility.lazy import lazy_import
+from ..utility.date import Date, day_number, month_keys
+from . import aggregate
+
+np = lazy_import("numpy")
+
+GRANULARITIES = ["day", "week", "month", "year"]
+VERSION = 3
+
+
+class RollupCube:
+    """
+    Materialized totals and counts of spending by (period, category)
+
+    A cell is kept for every period of each granularity and every category or ancestor
+    category with spending in it. Categories which first appear mid-history simply
+    start getting cells.
+
+    Cells are kept per partition of the history, the months of partition.py, along
+    with the digest of each partition's transactions. Bringing the cube up to date
+    only recounts the partitions whose digest changed, so statements arriving out of
+    date order, late charges on a day already counted and recategorized vendors all
+    end up in the totals. Cells of one period from several partitions, such as a week
+    spanning two months, are summed when they're read.
+
+    The cube is saved as a .npz archive, and only the granularities a query reads are
+    loaded from it.
+    """
+
+    def __init__(self):
+        self.digests: dict[str, str] = {}  # Partition key -> digest
+        self.categories: list[str] = []  # Category and ancestor category by id
+        self._category_ids: dict[str, int] = {}
+
+        # Granularity -> partition key -> (cells, 4) of period key, category id, cents
+        # and count. Granularities are loaded from _archive the first time they're used
+        self._cells: dict[str, dict[str, np.ndarray]] = {}
+        self._archive = None
+        self._archive_keys: list[str] = []
+
+    @staticmethod
+    def load(cube_file: str) -> RollupCube:
+        """
+        Open a saved cube, or return an empty one if cube_file doesn't exist or was
+        saved by an older version, so the next update rebuilds it
+
+        Args:
+            cube_file (str): Path of the cube
+
+        Returns:
+            RollupCube: The cube
+        """
+
+        cube = RollupCube()
+        if not os.path.isfile(cube_file):
+            return cube
+
+        try:
+            archive = np.load(cube_file, allow_pickle=False)
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return cube
+        if not isinstance(archive, np.lib.npyio.NpzFile) or "meta" not in archive:
+            return cube
+
+        meta = json.loads(str(archive["meta"]))
+        if meta["version"] != VERSION:
+            archive.close()
+            return cube
+
+        cube.categories = meta["categories"]
+        cube._category_ids = {c: i for i, c in enumerate(cube.categories)}
+        cube.digests = dict(meta["partitions"])
+        cube._archive = archive
+        cube._archive_keys = [key for key, _ in meta["partitions"]]
+
+        return cube
+
+    def save(self, cube_file: str):
+        """
+        Save the cube, replacing cube_file atomically
+
+        Args:
+            cube_file (str): Path of the cube
+        """
+
+        keys = sorted(self.digests)
+        meta = {
+            "version": VERSION,
+            "categories": self.categories,
+            "partitions": [[key, self.digests[key]] for key in keys],
+        }
+        arrays = {"meta": np.array(json.dumps(meta))}
+
+        for granularity in GRANULARITIES:
+            cells = self._granularity(granularity)
+            parts = [cells[key] for key in keys]
+            arrays[f"{granularity}.offsets"] = np.cumsum(
+                [0] + [len(part) for part in parts], dtype=np.int64
+            )
+            arrays[f"{granularity}.cells"] = (
+                np.concatenate(parts) if len(parts) > 0 else np.zeros((0, 4), np.int64)
+            )
+
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+        # Written through a file object, so numpy doesn't append .npz to the name
+        tmp = f"{cube_file}.tmp"
+        with open(tmp, "wb") as f_stream:
+            np.savez(f_stream, **arrays)
+        os.replace(tmp, cube_file)
+
+    def sync(self, history_dir: str, index: dict | None = None) -> int:
+        """
+        Bring the cube up to date with a history directory of partition.write
+
+        The digests partition.write keeps in the index are compared with the cube's,
+        and only the partitions whose digest changed are read.
+
+        Args:
+            history_dir (str): Directory of the partitions
+            index (dict | None): partition.read_index of history_dir, if already read
+
+        Returns:
+            int: Number of partitions recounted or removed
+        """
+
+        if index is None:
+            index = partition.read_index(history_dir)
+        entries = index["partitions"]
+
+        changed = 0
+        for key in sorted(entries):
+            entry = entries[key]
+            if self.digests.get(key) == entry["digest"]:
+                continue
+
+            columns, _ = store.read(os.path.join(history_dir, entry["file"]))
+            ancestors = self._ancestors(columns["categories"])
+            self._replace(
+                key,
+                entry["digest"],
+                self._count(
+                    columns["dates"],
+                    columns["amounts"],
+                    columns["category_codes"],
+                    ancestors,
+                ),
+            )
+            changed += 1
+
+        return changed + self._remove_missing(entries)
+
+    def update(self, transactions) -> int:
+        """
+        Bring the cube up to date with the full transaction history, for sources without
+        a history directory
+
+        Each month is digested from its code columns and the dictionary strings they
+        use, and only the months whose digest changed are recounted.
+
+        Args:
+            transactions (Transactions | TransactionsView): The full history. Months
+                the cube holds which aren't in it are removed.
+
+        Returns:
+            int: Number of partitions recounted or removed
+        """
+
+        dates = transactions.dates
+        columns = [
+            dates,
+            transactions.amounts,
+            transactions.vendor_codes,
+            transactions.category_codes,
+        ]
+        if len(dates) > 1 and np.any(dates[1:] < dates[:-1]):
+            order = np.argsort(dates, kind="stable")
+            columns = [column[order] for column in columns]
+            dates = columns[0]
+
+        bounds = np.flatnonzero(np.diff(month_keys(dates)) != 0) + 1
+        starts = np.concatenate(([0], bounds)).astype(np.int64)
+        ends = np.concatenate((bounds, [len(dates)])).astype(np.int64)
+        keys = partition.partition_keys(dates[starts]) if len(dates) > 0 else []
+
+        ancestors = None
+        changed = 0
+        for key, start, end in zip(
+            [str(key) for key in keys], starts.tolist(), ends.tolist()
+        ):
+            rows = [column[start:end] for column in columns]
+            digest = _digest(*rows, transactions.vendors, transactions.categories)
+            if self.digests.get(key) == digest:
+                continue
+
+            if ancestors is None:
+                ancestors = self._ancestors(transactions.categories)
+            self._replace(
+                key, digest, self._count(rows[0], rows[1], rows[3], ancestors)
+            )
+            changed += 1
+
+        return changed + self._remove_missing(set(keys))
+
+    def matrix(
+        self,
+        granularity: str,
+        order: dict[str, int],
+        first: int | None = None,
+        last: int | None = None,
+    ):
+        """
+        Totals and counts as period x category matrices
+
+        Args:
+            granularity (str): One of GRANULARITIES
+            order (dict[str, int]): Column of each category and ancestor category.
+                Categories in the cube but not in order are left out.
+            first (int | None): First period key to include, as aggregate.period_keys
+            last (int | None): Last period key to include
+
+        Returns:
+            tuple: (header, data, counts) as aggregate.period_data, with counts the
+                number of transactions in each cell
+        """
+
+        parts = list(self._granularity(granularity).values())
+        cells = np.concatenate(parts) if len(parts) > 0 else np.zeros((0, 4), np.int64)
+
+        periods = cells[:, 0]
+        selected = np.ones(len(cells), bool)
+        if first is not None:
+            selected &= periods >= first
+        if last is not None:
+            selected &= periods <= last
+        cells, periods = cells[selected], periods[selected]
+
+        if len(cells) == 0:
+            empty = np.zeros((0, len(order)), np.int64)
+            return [], empty, empty.copy()
+
+        step = 7 if granularity == "week" else 1
+        first, last = int(periods.min()), int(periods.max())
+        n_periods = (last - first) // step + 1
+
+        # Column of each category id, -1 for those not in order
+        columns = np.full(len(self.categories), -1, np.int64)
+        for category, column in order.items():
+            if category in self._category_ids:
+                columns[self._category_ids[category]] = column
+
+        column = columns[cells[:, 1]]
+        kept = column >= 0
+        at = ((periods[kept] - first) // step, column[kept])
+
+        data = np.zeros((n_periods, len(order)), np.int64)
+        counts = np.zeros((n_periods, len(order)), np.int64)
+        np.add.at(data, at, cells[kept, 2])
+        np.add.at(counts, at, cells[kept, 3])
+
+        header = [
+            aggregate.period_label(first + i * step, granularity)
+            for i in range(n_periods)
+        ]
+
+        return header, data, counts
+
+    def _granularity(self, granularity: str) -> dict[str, np.ndarray]:
+        """
+        Returns the cells of each partition at granularity, loading them if needed
+        """
+
+        if granularity not in self._cells:
+            cells = {}
+            if self._archive is not None:
+                offsets = self._archive[f"{granularity}.offsets"].tolist()
+                saved = self._archive[f"{granularity}.cells"]
+                for i, key in enumerate(self._archive_keys):
+                    cells[key] = saved[offsets[i] : offsets[i + 1]]
+            self._cells[granularity] = cells
+
+        return self._cells[granularity]
+
+    def _replace(self, key: str, digest: str, cells: dict[str, np.ndarray]):
+        for granularity in GRANULARITIES:
+            self._granularity(granularity)[key] = cells[granularity]
+        self.digests[key] = digest
+
+    def _remove_missing(self, keys) -> int:
+        """
+        Remove the partitions not in keys
+
+        Returns:
+            int: Number removed
+        """
+
+        removed = [key for key in self.digests if key not in keys]
+        for key in removed:
+            for granularity in GRANULARITIES:
+                self._granularity(granularity).pop(key, None)
+            del self.digests[key]
+
+        return len(removed)
+
+    def _ancestors(self, categories: list[str]) -> np.ndarray:
+        """
+        Returns the (len(categories), cube categories) matrix rolling each leaf category
+        up to the ids of itself and its ancestors, adding ids for new categories
+        """
+
+        for category in categories:
+            sub_cats = category.split(".")
+            while len(sub_cats) > 0:
+                name = ".".join(sub_cats)
+                if name not in self._category_ids:
+                    self._category_ids[name] = len(self.categories)
+                    self.categories.append(name)
+                sub_cats = sub_cats[:-1]
+
+        return aggregate.ancestor_matrix(categories, self._category_ids)
+
+    def _count(self, dates, amounts, category_codes, ancestors) -> dict:
+        """
+        Cells of one partition's transactions
+
+        Args:
+            ancestors (np.ndarray): _ancestors() of the categories category_codes index
+
+        Returns:
+            dict: Granularity -> (cells, 4) of period key, category id, cents and count
+        """
+
+        n_leaves, n_ids = ancestors.shape
+        leaf_of, id_of = np.nonzero(ancestors)
+        first_pair = np.concatenate(([0], np.cumsum(ancestors.sum(axis=1))))
+        category_codes = np.asarray(category_codes, np.int64)
+
+        cells = {}
+        for granularity in GRANULARITIES:
+            keys, _ = aggregate.period_keys(dates, granularity)
+
+            # Group leaf cells with one unique pass, then sum and count them
+            leaves = keys.astype(np.int64) * n_leaves + category_codes
+            unique, inverse = np.unique(leaves, return_inverse=True)
+            cents = np.zeros(len(unique), np.int64)
+            np.add.at(cents, inverse, amounts)
+            counts = np.bincount(inverse, minlength=len(unique))
+            period, code = np.divmod(unique, n_leaves)
+
+            # Repeat each leaf cell for the category and every ancestor it rolls up to
+            n_pairs = first_pair[code + 1] - first_pair[code]
+            cell = np.repeat(np.arange(len(unique)), n_pairs)
+            rank = np.arange(len(cell)) - np.repeat(
+                np.cumsum(n_pairs) - n_pairs, n_pairs
+            )
+            ids = id_of[first_pair[code[cell]] + rank]
+
+            # Then merge leaves rolling up to the same ancestor in the same period
+            rolled = period[cell] * n_ids + ids
+            unique, inverse = np.unique(rolled, return_inverse=True)
+            table = np.zeros((len(unique), 4), np.int64)
+            table[:, 0], table[:, 1] = np.divmod(unique, n_ids)
+            np.add.at(table[:, 2], inverse, cents[cell])
+            np.add.at(table[:, 3], inverse, counts[cell])
+            cells[granularity] = table
+
+        return cells
+
+
+def period_bounds(
+    granularity: str, start: Date | str | None, end: Date | str | None
+) -> tuple[int | None, int | None]:
+    """
+    Keys of the periods of granularity containing start and end, as the first and last
+    arguments of RollupCube.matrix. None for either that is None.
+    """
+
+    return tuple(
+        (
+            None
+            if date is None
+            else int(aggregate.period_keys([day_number(date)], granularity)[0][0])
+        )
+        for date in (start, end)
+    )
+
+
+def _digest(dates, amounts, vendor_codes, category_codes, vendors, categories) -> str:
+    """
+    Returns a digest of the code columns of some transactions and the dictionary
+    strings they use, without re-encoding the strings
+    """
+
+    digest = hashlib.sha256()
+    for column, dtype in zip(
+        [dates, amounts, vendor_codes, category_codes], dict(store.COLUMNS).values()
+    ):
+        digest.update(np.ascontiguousarray(column, dtype=dtype).tobytes())
+    for codes, dictionary in [(vendor_codes, vendors), (category_codes, categories)]:
+        used = np.unique(codes).tolist()
+        digest.update(np.asarray(used, np.int64).tobytes())
+        digest.update("\n".join(dictionary[code] for code in used).encode())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
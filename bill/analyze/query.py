@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import csv
+import json
+
+from ..utility.lazy import lazy_import
+from ..utility.date import Date
+from ..utility.money import Money
+from . import aggregate
+from .create_doc import add_category, load_cube, ordered_header
+from .cube import period_bounds
+from .transactions import Transactions
+
+np = lazy_import("numpy")
+
+
+def category_order(categories: list[str], category: str | None = None):
+    """
+    Returns the column of each category and ancestor category, in workbook order
+
+    Args:
+        categories (list[str]): Leaf categories to order, in order of first appearance
+        category (str | None): Only order this category and its subcategories
+    """
+
+    struct = {}
+    for c in categories:
+        add_category(struct, c)
+
+    if len(struct) == 0:
+        return {}
+
+    order = ordered_header(struct)
+    if category is not None:
+        kept = [c for c in order if c == category or c.startswith(f"{category}.")]
+        order = {c: i for i, c in enumerate(kept)}
+
+    return order
+
+
+def totals(
+    transactions: Transactions,
+    granularity: str = "month",
+    category: str | None = None,
+) -> list[dict]:
+    """
+    Total spending by period and category, including ancestor categories
+
+    Args:
+        transactions (Transactions): Transactions to total, already limited to the
+            dates to total
+        granularity (str): One of aggregate.GRANULARITIES
+        category (str | None): Only total this category and its subcategories
+
+    Returns:
+        list[dict]: "period", "category" and "total" of each cell with spending
+    """
+
+    order = category_order(transactions.categories, category)
+    header, data = aggregate.period_data(transactions, order, granularity)
+
+    return _total_rows(header, data, order)
+
+
+def cube_totals(
+    source: str,
+    cube_file: str,
+    granularity: str = "month",
+    category: str | None = None,
+    start: Date | None = None,
+    end: Date | None = None,
+) -> list[dict]:
+    """
+    totals() read from a RollupCube kept up to date with source, in whole periods
+    overlapping start and end
+
+    Only partitions of source that changed since the cube was saved are read, see
+    create_doc.load_cube.
+
+    Args:
+        source (str): Path of the .csv or .bill file, or history directory
+        cube_file (str): Path of the cube
+        granularity (str): One of cube.GRANULARITIES
+        category (str | None): Only total this category and its subcategories
+        start (Date | None): First date to total
+        end (Date | None): Last date to total
+
+    Returns:
+        list[dict]: "period", "category" and "total" of each cell with spending
+    """
+
+    cube, categories = load_cube(cube_file, source)
+    order = category_order(categories, category)
+    header, data, _ = cube.matrix(
+        granularity, order, *period_bounds(granularity, start, end)
+    )
+
+    return _total_rows(header, data, order)
+
+
+def _total_rows(header: list[str], data: np.ndarray, order: dict[str, int]):
+    categories = list(order)
+    rows = []
+    for i, j in zip(*np.nonzero(data)):
+        rows.append(
+            {
+                "period": header[i],
+                "category": categories[j],
+                "total": str(Money(data[i, j])),
+            }
+        )
+
+    return rows
+
+
+def top_vendors(transactions: Transactions, n: int = 10) -> list[dict]:
+    """
+    The vendors with the most spending
+
+    Args:
+        transactions (Transactions): Transactions to total
+        n (int): Number of vendors
+
+    Returns:
+        list[dict]: "vendor", "total" and "count" of each vendor, by total descending
+    """
+
+    codes = transactions.vendor_codes
+    n_vendors = len(transactions.vendors)
+
+    spent = np.zeros(n_vendors, np.int64)
+    np.add.at(spent, codes, transactions.amounts)
+    counts = np.bincount(codes, minlength=n_vendors)
+
+    top = np.argsort(-spent, kind="stable")
+    top = top[counts[top] > 0][:n]
+
+    return [
+        {
+            "vendor": transactions.vendors[v],
+            "total": str(Money(spent[v])),
+            "count": int(counts[v]),
+        }
+        for v in top.tolist()
+    ]
+
+
+def transaction_rows(transactions) -> list[dict]:
+    """
+    Returns:
+        list[dict]: "date", "amount", "vendor" and "category" of each transaction
+    """
+
+    return [
+        {
+            "date": str(t["date"]),
+            "amount": str(t["amount"]),
+            "vendor": t["vendor"],
+            "category": t["category"],
+        }
+        for t in transactions
+    ]
+
+
+def write_rows(rows: list[dict], output_format: str, f_stream):
+    """
+    Write rows as "csv" with a header line, or as a "json" list of objects
+    """
+
+    if output_format == "json":
+        json.dump(rows, f_stream, indent=2)
+        f_stream.write("\n")
+    elif output_format == "csv":
+        if len(rows) == 0:
+            return
+        writer = csv.DictWriter(f_stream, fieldnames=list(rows[0]), lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        raise ValueError(f"Unknown output format {output_format}")
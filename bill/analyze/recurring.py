@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import re
+from typing import TypedDict
+
+from ..utility.lazy import lazy_import
+from ..utility.date import Date
+from ..utility.money import Money
+
+np = lazy_import("numpy")
+
+# Frequency -> (period in days, days a charge may land either side of it)
+FREQUENCIES = {
+    "weekly": (7, 1),
+    "monthly": (30, 4),
+    "annual": (365, 10),
+}
+
+_NO_GAP = 1 << 40  # Sorts after every real gap
+
+
+class RecurringCharge(TypedDict):
+    vendor: str
+    frequency: str
+    charges: int
+    first: Date
+    last: Date
+    next_due: Date
+    typical_amount: Money
+    last_amount: Money
+    previous_amount: Money  # Amount before the last change in price
+    gap_cv: float
+    amount_cv: float
+    missed: int  # Charges skipped between the first and last
+    overdue: bool  # The charge after the last hasn't come by as_of
+    price_increase: bool  # The last change in price was an increase
+
+
+def canonical_vendor(vendor: str) -> str:
+    """
+    Returns the vendor with store numbers, reference codes and punctuation removed, so
+    the charges of one merchant share a name
+
+        Parameters:
+            vendor (str): Vendor as it appears on the statement, such as
+                "AMZN MKTP US*2K4" or "GIANT EAGLE #12"
+
+        Returns:
+            str: Canonical vendor, such as "AMZN MKTP US" or "GIANT EAGLE"
+    """
+
+    name = vendor.upper().split("*")[0]
+    name = re.sub("[^A-Z0-9&]+", " ", name)
+    words = [word for word in name.split() if not any(c.isdigit() for c in word)]
+
+    return " ".join(words) if len(words) > 0 else vendor.strip().upper()
+
+
+def find_recurring(
+    transactions,
+    as_of: Date | None = None,
+    min_charges: int = 3,
+    amount_tolerance: float = 0.25,
+    max_irregular: float = 0.2,
+) -> list[RecurringCharge]:
+    """
+    Find the recurring charges in transactions
+
+    Charges are first split into series of one canonical vendor with similar amounts,
+    so a subscription is found even when the same vendor has other, one-off charges.
+    For each of FREQUENCIES, a series that starts one or more periods after another
+    regular series of its vendor ends continues that series' charge, so a change in
+    price is reported on the charge rather than starting a new one. Each charge is
+    then put in date order by one sort over the whole history, and the gaps and
+    amounts of every charge are summarized at once. A charge is recurring when most of
+    its gaps are a whole number of periods.
+
+        Parameters:
+            transactions (Transactions | TransactionsView): Transactions to search
+            as_of (Date | None): Date to check for overdue charges. Defaults to the
+                date of the last transaction.
+            min_charges (int): Fewest charges in a recurring series
+            amount_tolerance (float): Largest relative change in amount between two
+                charges of one series
+            max_irregular (float): Largest fraction of gaps in a recurring series
+                that aren't a whole number of periods
+
+        Returns:
+            list[RecurringCharge]: Recurring series, by vendor
+    """
+
+    dates = transactions.dates.astype(np.int64)
+    if len(dates) == 0:
+        return []
+
+    amounts = transactions.amounts
+    vendors = transactions.vendors
+
+    canon_names: dict[str, int] = {}
+    canon_of_vendor = np.array(
+        [
+            canon_names.setdefault(canonical_vendor(v), len(canon_names))
+            for v in vendors
+        ],
+        dtype=np.int64,
+    )
+    canon = canon_of_vendor[transactions.vendor_codes]
+
+    # Split each vendor's charges into series of similar amounts: in amount order, a
+    # new series starts wherever the amount jumps by more than the tolerance
+    by_amount = np.lexsort((amounts, canon))
+    sorted_amounts = amounts[by_amount]
+    jump = np.abs(np.diff(sorted_amounts)) > amount_tolerance * np.maximum(
+        np.abs(sorted_amounts[:-1]), 1
+    )
+    new_series = np.concatenate(([True], jump | (np.diff(canon[by_amount]) != 0)))
+    series = np.empty(len(dates), np.int64)
+    series[by_amount] = np.cumsum(new_series) - 1
+
+    if as_of is None:
+        as_of_day = int(transactions.dates.max())
+    else:
+        as_of_day = as_of.to_int()
+
+    recurring: list[RecurringCharge] = []
+
+    for frequency, (period, slack) in FREQUENCIES.items():
+        chains = _chain_series(series, canon, dates, period, slack)
+
+        # The one sort by (chain, date) everything below works from
+        order = np.lexsort((dates, chains))
+        chain, days, chain_amounts = chains[order], dates[order], amounts[order]
+        vendor_codes = transactions.vendor_codes[order]
+
+        starts, counts, ends, gaps, has_gap = _groups(chain, days)
+        n_gaps = counts - 1
+
+        gap_cv = _cv(
+            _group_sum(np.where(has_gap, gaps, 0), starts) / np.maximum(n_gaps, 1),
+            _group_sum(np.where(has_gap, gaps * gaps, 0), starts),
+            n_gaps,
+        )
+        gap_median = _group_median(np.where(has_gap, gaps, _NO_GAP), starts, n_gaps)
+
+        amount_f = chain_amounts.astype(np.float64)
+        amount_mean = _group_sum(amount_f, starts) / counts
+        amount_cv = _cv(amount_mean, _group_sum(amount_f * amount_f, starts), counts)
+        amount_median = _group_median(chain_amounts, starts, counts)
+
+        # The last charge of each chain at a different amount than its last charge
+        last_amounts = np.repeat(chain_amounts[ends], counts)
+        changed = np.where(
+            chain_amounts != last_amounts, np.arange(len(chain_amounts)), -1
+        )
+        last_change = np.maximum.reduceat(changed, starts)
+        previous = np.where(
+            last_change >= 0, chain_amounts[last_change], chain_amounts[ends]
+        )
+
+        # Each gap as a whole number of periods, and whether it lands near one
+        multiple = np.rint(gaps / period).astype(np.int64)
+        regular = (
+            has_gap & (multiple >= 1) & (np.abs(gaps - multiple * period) <= slack)
+        )
+        n_regular = _group_sum(regular.astype(np.int64), starts)
+        missed = _group_sum(np.where(regular, multiple - 1, 0), starts)
+
+        candidate = (
+            (counts >= max(min_charges, 2))
+            & (np.abs(gap_median - period) <= slack)
+            & (n_gaps - n_regular <= max_irregular * n_gaps)
+        )
+
+        for g in np.flatnonzero(candidate).tolist():
+            first, last = starts[g], ends[g]
+            last_day = int(days[last])
+            next_due = last_day + period
+
+            recurring.append(
+                {
+                    "vendor": vendors[vendor_codes[last]],
+                    "frequency": frequency,
+                    "charges": int(counts[g]),
+                    "first": Date.from_int(days[first]),
+                    "last": Date.from_int(last_day),
+                    "next_due": Date.from_int(next_due),
+                    "typical_amount": Money(amount_median[g]),
+                    "last_amount": Money(chain_amounts[last]),
+                    "previous_amount": Money(previous[g]),
+                    "gap_cv": float(gap_cv[g]),
+                    "amount_cv": float(amount_cv[g]),
+                    "missed": int(missed[g]),
+                    "overdue": as_of_day > next_due + slack,
+                    "price_increase": bool(chain_amounts[last] > previous[g]),
+                }
+            )
+
+    recurring.sort(key=lambda charge: (charge["vendor"], charge["first"]))
+    return recurring
+
+
+def _groups(labels: np.ndarray, dates: np.ndarray):
+    """
+    Runs of equal labels in (label, date) order, and the gaps between their dates
+
+    Returns:
+        tuple: (starts, counts, ends, gaps, has_gap) where a group of n charges has
+            n - 1 gaps, stored from the group's start, and the slot of each group's
+            last charge holds no gap
+    """
+
+    starts = np.flatnonzero(np.concatenate(([True], np.diff(labels) != 0)))
+    counts = np.diff(np.concatenate((starts, [len(labels)])))
+    ends = starts + counts - 1
+
+    gaps = np.zeros(len(dates), np.int64)
+    gaps[:-1] = np.diff(dates)
+    has_gap = np.ones(len(dates), bool)
+    has_gap[ends] = False
+
+    return starts, counts, ends, gaps, has_gap
+
+
+def _chain_series(
+    series: np.ndarray, canon: np.ndarray, dates: np.ndarray, period: int, slack: int
+) -> np.ndarray:
+    """
+    Chain each series onto an earlier series of its canonical vendor that it follows
+    at a whole number of periods, once that earlier series has ended
+
+    A series is only chained on to one whose own gaps are regular, and only if it is a
+    single charge or regular itself, so one-off charges don't start or join a chain.
+
+    Returns:
+        np.ndarray: Chain of each charge, labelled by its first series
+    """
+
+    order = np.lexsort((dates, series))
+    starts, counts, ends, gaps, has_gap = _groups(series[order], dates[order])
+    gap_median = _group_median(
+        np.where(has_gap, gaps, _NO_GAP), starts, np.maximum(counts - 1, 1)
+    )
+    first_days = dates[order][starts].tolist()
+    last_days = dates[order][ends].tolist()
+    vendor = canon[order][starts].tolist()
+    regular = ((counts >= 2) & (np.abs(gap_median - period) <= slack)).tolist()
+
+    chain_of = np.arange(len(starts))
+    tails: dict[int, list[int]] = {}  # Vendor -> last series of each regular chain
+    for s in sorted(range(len(starts)), key=lambda s: first_days[s]):
+        chains = tails.setdefault(vendor[s], [])
+
+        for i, tail in enumerate(chains):
+            gap = first_days[s] - last_days[tail]
+            multiple = round(gap / period)
+            if (
+                (regular[s] or counts[s] == 1)
+                and multiple >= 1
+                and abs(gap - multiple * period) <= slack
+            ):
+                chain_of[s] = chain_of[tail]
+                chains[i] = s
+                break
+        else:
+            if regular[s]:
+                chains.append(s)
+
+    labels = np.empty(len(series), np.int64)
+    labels[order] = np.repeat(chain_of, counts)
+    return labels
+
+
+def _group_sum(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    return np.add.reduceat(values, starts)
+
+
+def _cv(mean: np.ndarray, sum_sq: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """
+    Coefficient of variation of each group from its mean and sum of squares
+    """
+
+    n = np.maximum(n, 1)
+    variance = np.maximum(sum_sq / n - mean * mean, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cv = np.sqrt(variance) / np.abs(mean)
+    return np.nan_to_num(cv)
+
+
+def _group_median(values: np.ndarray, starts: np.ndarray, n: np.ndarray) -> np.ndarray:
+    """
+    Median of the first n[g] values of each group g, which start at starts. Values past
+    the first n[g] must sort after them.
+    """
+
+    group = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, len(values))))
+    ordered = values[np.lexsort((values, group))]
+
+    n = np.maximum(n, 1)
+    lo = ordered[starts + (n - 1) // 2]
+    hi = ordered[starts + n // 2]
+    return (lo + hi) // 2 if values.dtype.kind == "i" else (lo + hi) / 2
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from ..utility.lazy import lazy_import
+from ..utility.date import Date, day_number
+from . import aggregate
+
+np = lazy_import("numpy")
+
+
+class RollingSpend:
+    """
+    Rolling spending per category over the daily timeline, from prefix sums
+
+    The daily totals of every category and ancestor category are summed once into a
+    cumulative array with a leading zero row, so the spending of any window of days is
+    the difference of two rows. Every query below is answered for all days and
+    categories at once, without looking at the transactions again.
+
+    Amounts are in cents.
+    """
+
+    def __init__(self, transactions, order: dict[str, int]):
+        """
+        Args:
+            transactions (Transactions | TransactionsView): Transactions to sum
+            order (dict[str, int]): Column of each category and ancestor category
+        """
+
+        self.order = order
+
+        dates = transactions.dates
+        if len(dates) == 0:
+            self.first = 0
+            self.cumulative = np.zeros((1, len(order)), np.int64)
+            return
+
+        self.first = int(dates.min())
+        n_days = int(dates.max()) - self.first + 1
+        n_leaves = len(transactions.categories)
+
+        cells = (dates.astype(np.int64) - self.first) * n_leaves
+        cells += transactions.category_codes
+        leaf_data = np.zeros(n_days * n_leaves, np.int64)
+        np.add.at(leaf_data, cells, transactions.amounts)
+        leaf_data = leaf_data.reshape(n_days, n_leaves)
+
+        daily = leaf_data @ aggregate.ancestor_matrix(transactions.categories, order)
+
+        self.cumulative = np.zeros((n_days + 1, len(order)), np.int64)
+        np.cumsum(daily, axis=0, out=self.cumulative[1:])
+
+    def __len__(self) -> int:
+        return self.cumulative.shape[0] - 1
+
+    @property
+    def days(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: Day number (Date.to_int()) of each row of the daily queries
+        """
+
+        return np.arange(self.first, self.first + len(self), dtype=np.int32)
+
+    def daily(self) -> np.ndarray:
+        """
+        Returns:
+            np.ndarray: (days, categories) spending on each day
+        """
+
+        return np.diff(self.cumulative, axis=0)
+
+    def window(self, start, end) -> np.ndarray:
+        """
+        Spending between two dates, inclusive
+
+        Args:
+            start (Date | str | int | np.ndarray): First day of each window. Ints and
+                arrays are day numbers.
+            end (Date | str | int | np.ndarray): Last day of each window
+
+        Returns:
+            np.ndarray: Spending per category, with a leading axis if start or end
+                are arrays
+        """
+
+        lo = self._row(start)
+        hi = self._row(end, 1)
+        return self.cumulative[hi] - self.cumulative[np.minimum(lo, hi)]
+
+    def trailing(self, n: int) -> np.ndarray:
+        """
+        Args:
+            n (int): Days in the window
+
+        Returns:
+            np.ndarray: (days, categories) spending over the n days ending on each day
+        """
+
+        ends = np.arange(1, len(self) + 1)
+        starts = np.maximum(ends - n, 0)
+        return self.cumulative[ends] - self.cumulative[starts]
+
+    def moving_average(self, n: int) -> np.ndarray:
+        """
+        Args:
+            n (int): Days in the window
+
+        Returns:
+            np.ndarray: (days, categories) average daily spending over the n days
+                ending on each day, in (fractional) cents. Days fewer than n days
+                into the history are averaged over the days so far.
+        """
+
+        days = np.minimum(np.arange(1, len(self) + 1), n)
+        return self.trailing(n) / days[:, np.newaxis]
+
+    def delta(self, n: int) -> np.ndarray:
+        """
+        Period over period change
+
+        Args:
+            n (int): Days in each period
+
+        Returns:
+            np.ndarray: (days, categories) spending over the n days ending on each day,
+                minus the spending over the n days before those
+        """
+
+        current = self.trailing(n)
+        previous = np.zeros_like(current)
+        previous[n:] = current[: max(len(current) - n, 0)]
+        return current - previous
+
+    def column(self, category: str) -> int:
+        """
+        Returns:
+            int: Column of a category in the query results
+        """
+
+        return self.order[category]
+
+    def _row(self, day, offset: int = 0):
+        if not isinstance(day, np.ndarray):
+            day = day_number(day)
+        return np.clip(np.asarray(day) + offset - self.first, 0, len(self))
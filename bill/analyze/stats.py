@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from statistics import NormalDist
+
+from ..utility.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Months the summary statistics start from by default
+DEFAULT_MONTHS = ["09/2022", "09/2023", "09/2024", "02/2025"]
+
+
+def window_starts(month_header: list[str], months: list[str]) -> list[int]:
+    """
+    Returns the row of each start month in month_header, 0 (all months) if it's missing
+
+    Args:
+        month_header (list[str]): "mm/yyyy" label of each month
+        months (list[str]): "mm/yyyy" start months
+    """
+
+    rows = {month: i for i, month in enumerate(month_header)}
+    return [rows.get(month, 0) for month in months]
+
+
+def window_stats(data: np.ndarray, starts: list[int], confidence: float = 0.95):
+    """
+    Mean, sample standard deviation and confidence interval of each category from each
+    start row through the last row
+
+    Sums and sums of squares of every window come from one cumulative sum over the
+    rows, in exact integer cents. Matches Excel's AVERAGE, STDEV and
+    CONFIDENCE(1 - confidence, STDEV, COUNT): a window of one month has an infinite
+    standard deviation and interval, where Excel gives #DIV/0!.
+
+    Args:
+        data (np.ndarray): (months, categories) int64 totals in cents
+        starts (list[int]): First row of each window
+        confidence (float): Confidence level of the intervals
+
+    Returns:
+        tuple: (mean, std, interval) float arrays of shape (windows, categories) in
+            cents, where the mean is +/- interval with the given confidence
+    """
+
+    n_rows, n_cats = data.shape
+    starts = np.asarray(starts, dtype=np.int64)
+
+    sums = np.zeros((n_rows + 1, n_cats), np.int64)
+    sum_sq = np.zeros((n_rows + 1, n_cats), np.int64)
+    np.cumsum(data, axis=0, out=sums[1:])
+    np.cumsum(data * data, axis=0, out=sum_sq[1:])
+
+    n = (n_rows - starts)[:, None]
+    total = sums[-1] - sums[starts]
+    total_sq = sum_sq[-1] - sum_sq[starts]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / n
+
+        # n * sum(x^2) - sum(x)^2 is exact in integers, so there's no cancellation
+        variance = (n * total_sq - total * total) / (n * (n - 1))
+        std = np.sqrt(np.maximum(variance, 0))
+        std[np.broadcast_to(n < 2, std.shape)] = np.inf
+
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        interval = z * std / np.sqrt(n)
+
+    return mean, std, interval
@@ -1,163 +1,602 @@
 from __future__ import annotations
 from typing import TypedDict
 
-from ..utility.date import Date
-from ..utility import helpers
-
-
-class Transactions:
-    class Transaction(TypedDict):
-        date: Date
-        amount: float
-        vendor: str
-        category: str
+from ..utility.lazy import lazy_import
+from ..utility.date import (
+    Date,
+    day_number,
+    parse_dates,
+    week_keys,
+    month_keys,
+    year_keys,
+)
+from ..utility.money import Money, to_cents_array
+
+np = lazy_import("numpy")
+
+
+class _TransactionColumns:
+    """
+    Row access and grouping shared by Transactions and TransactionsView
+
+    Subclasses provide the dates, amounts, vendor_codes and category_codes columns, the
+    vendors and categories dictionaries, and _view to select rows by index.
+    """
+
+    @property
+    def transactions(self) -> list:
+        """
+        Every transaction as a Transaction dict
+        """
+
+        return list(self)
+
+    def by_category(self) -> dict[str, TransactionsView]:
+        """
+        Group transactions by category. A transaction is included in the group of its
+        category and of each of that category's ancestors.
+
+        Returns:
+            dict: Category -> view of its transactions, in their original order
+        """
+
+        codes = self.category_codes
+        if len(codes) == 0:
+            return {}
+
+        order = np.argsort(codes, kind="stable")
+        bounds = np.concatenate(
+            ([0], np.cumsum(np.bincount(codes, minlength=len(self.categories))))
+        )
+
+        # Categories in order of first appearance
+        present, first = np.unique(codes, return_index=True)
+        present = present[np.argsort(first)]
+
+        groups: dict[str, list[np.ndarray]] = {}
+        for code in present.tolist():
+            rows = order[bounds[code] : bounds[code + 1]]
+
+            sub_cats = self.categories[code].split(".")
+            while len(sub_cats) > 0:
+                groups.setdefault(".".join(sub_cats), []).append(rows)
+                sub_cats = sub_cats[:-1]
 
-    def __init__(self, transactions: list = []):
-        self.transactions = []
+        transactions: dict[str, TransactionsView] = {}
+        for category, parts in groups.items():
+            if len(parts) == 1:
+                transactions[category] = self._view(parts[0])
+            else:
+                transactions[category] = self._view(np.sort(np.concatenate(parts)))
 
-        for transaction in transactions:
-            self.add_transaction(*transaction)
+        return transactions
 
-    def add_transaction(self, date: str, amount: str, vendor: str, category: str):
-        transaction: Transactions.Transaction = {
-            "date": Date(date),
-            "amount": helpers.to_float(amount),
-            "vendor": vendor,
-            "category": category,
-        }
+    def by_day(self) -> dict[Date, TransactionsView]:
+        """
+        Returns:
+            dict: Every day from the first to the last transaction -> its transactions
+        """
 
-        self.transactions.append(transaction)
+        return self._group(self.dates, 1, Date.from_int)
 
-    def sort(self):
-        self.transactions.sort(key=lambda t: t["date"].to_int())
+    def by_week(self) -> dict[Date, TransactionsView]:
+        """
+        Returns:
+            dict: Every week (Date.to_week()) from the first to the last transaction ->
+                its transactions
+        """
 
-    def by_category(self) -> dict[str, Transactions]:
-        transactions: dict[str, Transactions] = {}
+        return self._group(week_keys(self.dates), 7, Date.from_int)
 
-        for transaction in self.transactions:
-            date = str(transaction["date"])
-            amount = str(transaction["amount"])
-            vendor = transaction["vendor"]
-            category = transaction["category"]
-
-            sub_cats = category.split(".")
-            while len(sub_cats) > 0:
-                sub_category = ".".join(sub_cats)
-                sub_cats = sub_cats[:-1]
+    def by_month(self) -> dict[str, TransactionsView]:
+        """
+        Returns:
+            dict: Every month ("mm/yyyy") from the first to the last transaction -> its
+                transactions
+        """
 
-                if sub_category not in transactions:
-                    transactions[sub_category] = Transactions()
+        return self._group(
+            month_keys(self.dates), 1, lambda k: f"{k % 12 + 1:0>2}/{k // 12:0>4}"
+        )
 
-                transactions[sub_category].add_transaction(
-                    date, amount, vendor, category
-                )
+    def by_year(self) -> dict[str, TransactionsView]:
+        """
+        Returns:
+            dict: Every year ("yyyy") from the first to the last transaction -> its
+                transactions
+        """
 
-        return transactions
+        return self._group(year_keys(self.dates), 1, lambda k: f"{k:0>4}")
 
-    def by_day(self) -> dict[Date, Transactions]:
-        transactions: dict[Date, Transactions] = {}
+    def _group(self, keys: np.ndarray, step: int, label) -> dict:
+        """
+        Bucket rows by an integer period key with one stable sort. Periods without
+        transactions between the first and last are included as empty views.
+        """
 
-        date_ind: Date = self.transactions[0]["date"]
+        if len(keys) == 0:
+            return {}
 
-        for transaction in self.transactions:
-            date = transaction["date"]
-            amount = str(transaction["amount"])
-            vendor = transaction["vendor"]
-            category = transaction["category"]
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
 
-            while date != date_ind:
-                transactions[date_ind] = Transactions()
-                date_ind = date_ind.next_day()
+        periods = np.arange(sorted_keys[0], sorted_keys[-1] + 1, step)
+        starts = np.searchsorted(sorted_keys, periods, side="left")
+        ends = np.searchsorted(sorted_keys, periods, side="right")
 
-            transactions[date].add_transaction(str(date), amount, vendor, category)
+        transactions = {}
+        for period, start, end in zip(periods.tolist(), starts.tolist(), ends.tolist()):
+            transactions[label(period)] = self._view(order[start:end])
 
         return transactions
 
-    def by_week(self) -> dict[Date, Transactions]:
-        transactions: dict[Date, Transactions] = {}
-
-        date_ind: Date = self.transactions[0]["date"].to_week()
-
-        for transaction in self.transactions:
-            date = transaction["date"]
-            amount = str(transaction["amount"])
-            vendor = transaction["vendor"]
-            category = transaction["category"]
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, i: int) -> dict:
+        n = len(self)
+        if i < 0:
+            i += n
+        if i < 0 or i >= n:
+            raise IndexError("Transaction index out of range")
+
+        return {
+            "date": Date.from_int(self.dates[i]),
+            "amount": Money(self.amounts[i]),
+            "vendor": self.vendors[self.vendor_codes[i]],
+            "category": self.categories[self.category_codes[i]],
+        }
 
-            if date.to_week() not in transactions:
-                transactions[date.to_week()] = Transactions()
-            while date.to_week() != date_ind:
-                if date_ind not in transactions:
-                    transactions[date_ind] = Transactions()
-                date_ind = date_ind.next_week()
+    def __iter__(self):
+        vendors, categories = self.vendors, self.categories
+
+        for date, amount, vendor, category in zip(
+            self.dates.tolist(),
+            self.amounts.tolist(),
+            self.vendor_codes.tolist(),
+            self.category_codes.tolist(),
+        ):
+            yield {
+                "date": Date.from_int(date),
+                "amount": Money(amount),
+                "vendor": vendors[vendor],
+                "category": categories[category],
+            }
+
+
+class Transactions(_TransactionColumns):
+    """
+    A collection of transactions stored as typed columns
+
+    Dates are held as int32 day numbers (Date.to_int()), amounts as int64 cents, and
+    vendors and categories as int32 codes into the vendors and categories lists. Rows
+    are still available as Transaction dicts for code which works one transaction at a
+    time.
+
+    A date index and a category index (rows sorted by date and by category code) and a
+    category prefix index back query(). They are brought up to date with rows inserted
+    since the last query by merging the new rows in, rather than re-sorting everything.
+    """
 
-            transactions[date.to_week()].add_transaction(
-                str(date), amount, vendor, category
-            )
+    class Transaction(TypedDict):
+        date: Date
+        amount: Money
+        vendor: str
+        category: str
 
-        return transactions
+    def __init__(self, transactions: list = []):
+        self._size = 0
+        self._dates = np.zeros(0, dtype=np.int32)
+        self._amounts = np.zeros(0, dtype=np.int64)
+        self._vendor_codes = np.zeros(0, dtype=np.int32)
+        self._category_codes = np.zeros(0, dtype=np.int32)
 
-    def by_month(self) -> dict[str, Transactions]:
-        transactions: dict[str, Transactions] = {}
-
-        month_ind = self.transactions[0]["date"].month
-        year_ind = self.transactions[0]["date"].year
-
-        for transaction in self.transactions:
-            date = transaction["date"]
-            amount = str(transaction["amount"])
-            vendor = transaction["vendor"]
-            category = transaction["category"]
-
-            month, year = date.month, date.year
-            key = f"{month:0>2}/{year:0>4}"
-            if key not in transactions:
-                transactions[key] = Transactions()
-            while month != month_ind and year != year_ind:
-                key = f"{month_ind:0>2}/{year_ind:0>4}"
-                if key not in transactions:
-                    transactions[key] = Transactions()
-                month_ind += 1
-                if month_ind > 12:
-                    month_ind = 1
-                    year_ind += 1
-
-            transactions[f"{month:0>2}/{year:0>4}"].add_transaction(
-                str(date), amount, vendor, category
-            )
+        self.vendors: list[str] = []  # Vendor string by vendor code
+        self.categories: list[str] = []  # Category string by category code
+        self._vendor_index: dict[str, int] = {}
+        self._category_index: dict[str, int] = {}
 
-        return transactions
+        # Category or ancestor category -> codes of every category under it
+        self._prefixes: dict[str, list[int]] = {}
+        self._clear_indexes()
 
-    def by_year(self) -> dict[str, Transactions]:
-        transactions: dict[str, Transactions] = {}
+        for transaction in transactions:
+            self.add_transaction(*transaction)
 
-        year_ind = self.transactions[0]["date"].year
+    @classmethod
+    def from_columns(
+        cls,
+        dates: np.ndarray,
+        amounts: np.ndarray,
+        vendor_codes: np.ndarray,
+        vendors: list[str],
+        category_codes: np.ndarray,
+        categories: list[str],
+    ) -> Transactions:
+        """
+        Create a collection directly from its columns without copying them
+
+        Args:
+            dates (np.ndarray): int32 day numbers
+            amounts (np.ndarray): int64 amounts in cents
+            vendor_codes (np.ndarray): int32 indices into vendors
+            vendors (list[str]): Vendor dictionary
+            category_codes (np.ndarray): int32 indices into categories
+            categories (list[str]): Category dictionary
+
+        Returns:
+            Transactions: The collection
+        """
+
+        transactions = cls()
+        transactions._size = len(dates)
+        transactions._dates = dates
+        transactions._amounts = amounts
+        transactions._vendor_codes = vendor_codes
+        transactions._category_codes = category_codes
+        transactions.vendors = vendors
+        transactions.categories = categories
+        transactions._vendor_index = {v: i for i, v in enumerate(vendors)}
+        transactions._category_index = {c: i for i, c in enumerate(categories)}
+        for code, category in enumerate(categories):
+            transactions._add_prefixes(category, code)
 
-        for transaction in self.transactions:
-            date = transaction["date"]
-            amount = str(transaction["amount"])
-            vendor = transaction["vendor"]
-            category = transaction["category"]
+        return transactions
 
-            year = date.year
+    def add_transaction(
+        self, date: str | Date, amount: str | Money, vendor: str, category: str
+    ):
+        if not isinstance(date, Date):
+            date = Date(date)
+        amount = Money.parse(amount)
+
+        i = self._size
+        self._reserve(i + 1)
+
+        self._dates[i] = date.to_int()
+        self._amounts[i] = amount.cents
+        self._vendor_codes[i] = self.vendor_code(vendor)
+        self._category_codes[i] = self.category_code(category)
+        self._size += 1
+
+    def extend(self, dates: list, amounts: list, vendors: list, categories: list):
+        """
+        Append whole columns of transactions at once
+
+        Args:
+            dates (list): "mm/dd/yyyy" strings, or an array of day numbers
+            amounts (list): Amount strings or Money, or an array of cents
+            vendors (list): Vendor strings
+            categories (list): Category strings
+        """
+
+        n = len(vendors)
+        if isinstance(dates, np.ndarray):
+            date_col = dates.astype(np.int32)
+        else:
+            date_col = parse_dates(dates)
+
+        if isinstance(amounts, np.ndarray):
+            amount_col = amounts.astype(np.int64)
+        else:
+            amount_col = to_cents_array(amounts)
+        vendor_col = np.fromiter(
+            (self.vendor_code(v) for v in vendors), dtype=np.int32, count=n
+        )
+        category_col = np.fromiter(
+            (self.category_code(c) for c in categories), dtype=np.int32, count=n
+        )
+
+        i = self._size
+        self._reserve(i + n)
+
+        self._dates[i : i + n] = date_col
+        self._amounts[i : i + n] = amount_col
+        self._vendor_codes[i : i + n] = vendor_col
+        self._category_codes[i : i + n] = category_col
+        self._size += n
+
+    def vendor_code(self, vendor: str) -> int:
+        """
+        Returns the code of a vendor, adding it to the dictionary if it is new
+        """
+
+        code = self._vendor_index.get(vendor)
+        if code is None:
+            code = len(self.vendors)
+            self._vendor_index[vendor] = code
+            self.vendors.append(vendor)
+        return code
+
+    def category_code(self, category: str) -> int:
+        """
+        Returns the code of a category, adding it to the dictionary if it is new
+        """
+
+        code = self._category_index.get(category)
+        if code is None:
+            code = len(self.categories)
+            self._category_index[category] = code
+            self.categories.append(category)
+            self._add_prefixes(category, code)
+        return code
+
+    @property
+    def dates(self) -> np.ndarray:
+        """
+        int32 day number (Date.to_int()) of each transaction
+        """
+
+        return self._dates[: self._size]
+
+    @property
+    def amounts(self) -> np.ndarray:
+        """
+        int64 amount of each transaction in cents
+        """
+
+        return self._amounts[: self._size]
+
+    @property
+    def vendor_codes(self) -> np.ndarray:
+        """
+        int32 index into vendors of each transaction
+        """
+
+        return self._vendor_codes[: self._size]
+
+    @property
+    def category_codes(self) -> np.ndarray:
+        """
+        int32 index into categories of each transaction
+        """
+
+        return self._category_codes[: self._size]
+
+    def take(self, indices: np.ndarray) -> Transactions:
+        """
+        Returns a new collection of the rows at indices, with copies of this one's
+        dictionaries, so adding to either doesn't change the other
+        """
+
+        taken = Transactions()
+        taken._dates = self.dates[indices]
+        taken._size = len(taken._dates)
+        taken._amounts = self.amounts[indices]
+        taken._vendor_codes = self.vendor_codes[indices]
+        taken._category_codes = self.category_codes[indices]
+        taken.vendors = list(self.vendors)
+        taken.categories = list(self.categories)
+        taken._vendor_index = dict(self._vendor_index)
+        taken._category_index = dict(self._category_index)
+        taken._prefixes = {
+            prefix: list(codes) for prefix, codes in self._prefixes.items()
+        }
 
-            while year != year_ind:
-                transactions[f"{year_ind:0>4}"] = Transactions()
-                year_ind += 1
+        return taken
 
-            transactions[f"{year:0>4}"].add_transaction(
-                str(date), amount, vendor, category
+    def sort(self):
+        order = np.argsort(self.dates, kind="stable")
+
+        self._dates = self.dates[order]
+        self._amounts = self.amounts[order]
+        self._vendor_codes = self.vendor_codes[order]
+        self._category_codes = self.category_codes[order]
+        self._clear_indexes()
+
+    def query(
+        self,
+        start: Date | str | None = None,
+        end: Date | str | None = None,
+        category: str | None = None,
+        vendor: str | None = None,
+        min_amount: Money | str | None = None,
+        max_amount: Money | str | None = None,
+    ) -> TransactionsView:
+        """
+        Select the transactions matching every given filter
+
+        The date range and category are answered from the indexes, starting from
+        whichever selects fewer rows; the remaining filters only look at those rows.
+
+        Args:
+            start (Date | str | None): First date, inclusive
+            end (Date | str | None): Last date, inclusive
+            category (str | None): Category, matching it and all of its subcategories
+            vendor (str | None): Case-insensitive substring of the vendor
+            min_amount (Money | str | None): Smallest amount, inclusive
+            max_amount (Money | str | None): Largest amount, inclusive
+
+        Returns:
+            TransactionsView: Matching transactions in date order
+        """
+
+        self._update_indexes()
+        dates = self.dates
+
+        first = day_number(start) if start is not None else None
+        last = day_number(end) if end is not None else None
+
+        date_range = None
+        if first is not None or last is not None:
+            lo, hi = 0, len(self._date_keys)
+            if first is not None:
+                lo = int(np.searchsorted(self._date_keys, first, "left"))
+            if last is not None:
+                hi = int(np.searchsorted(self._date_keys, last, "right"))
+            date_range = (lo, max(lo, hi))
+
+        codes = None
+        if category is not None:
+            codes = np.array(self._prefixes.get(category, []), dtype=np.int32)
+            starts = np.searchsorted(self._category_keys, codes, "left")
+            ends = np.searchsorted(self._category_keys, codes, "right")
+
+        if codes is not None and (
+            date_range is None or (ends - starts).sum() < date_range[1] - date_range[0]
+        ):
+            rows = np.concatenate(
+                [np.zeros(0, dtype=np.int64)]
+                + [self._category_order[s:e] for s, e in zip(starts, ends)]
             )
+            row_dates = dates[rows]
+            if first is not None:
+                rows, row_dates = (
+                    rows[row_dates >= first],
+                    row_dates[row_dates >= first],
+                )
+            if last is not None:
+                rows, row_dates = rows[row_dates <= last], row_dates[row_dates <= last]
+            rows = rows[np.lexsort((rows, row_dates))]
+        else:
+            rows = self._date_order
+            if date_range is not None:
+                rows = rows[date_range[0] : date_range[1]]
+            if codes is not None:
+                rows = rows[np.isin(self.category_codes[rows], codes)]
+
+        if vendor is not None:
+            needle = vendor.lower()
+            vendor_codes = [
+                i for i, v in enumerate(self.vendors) if needle in v.lower()
+            ]
+            rows = rows[np.isin(self.vendor_codes[rows], vendor_codes)]
+
+        if min_amount is not None:
+            rows = rows[self.amounts[rows] >= Money.parse(min_amount).cents]
+        if max_amount is not None:
+            rows = rows[self.amounts[rows] <= Money.parse(max_amount).cents]
+
+        return self._view(rows)
+
+    def _view(self, indices: np.ndarray) -> TransactionsView:
+        return TransactionsView(self, indices)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _add_prefixes(self, category: str, code: int):
+        """
+        Register a new category code under the category and each of its ancestors
+        """
+
+        sub_cats = category.split(".")
+        while len(sub_cats) > 0:
+            self._prefixes.setdefault(".".join(sub_cats), []).append(code)
+            sub_cats = sub_cats[:-1]
+
+    def _clear_indexes(self):
+        self._indexed = 0  # Rows covered by the date and category indexes
+        self._date_order = np.zeros(0, dtype=np.int64)
+        self._date_keys = np.zeros(0, dtype=np.int32)
+        self._category_order = np.zeros(0, dtype=np.int64)
+        self._category_keys = np.zeros(0, dtype=np.int32)
+
+    def _update_indexes(self):
+        """
+        Merge rows inserted since the last update into the date and category indexes
+        """
+
+        if self._indexed == self._size:
+            return
+
+        new = np.arange(self._indexed, self._size)
+        self._date_order, self._date_keys = _merge_index(
+            self._date_order, self._date_keys, new, self.dates
+        )
+        self._category_order, self._category_keys = _merge_index(
+            self._category_order, self._category_keys, new, self.category_codes
+        )
+        self._indexed = self._size
+
+    def _reserve(self, size: int):
+        """
+        Grow the column buffers to hold at least size rows
+        """
+
+        capacity = len(self._dates)
+        if size <= capacity:
+            return
+
+        capacity = max(size, 2 * capacity, 16)
+        n = self._size
+
+        for name in ["_dates", "_amounts", "_vendor_codes", "_category_codes"]:
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:n] = column[:n]
+            setattr(self, name, grown)
+
+
+class TransactionsView(_TransactionColumns):
+    """
+    A read-only selection of the rows of a Transactions, held as an index array
+
+    Columns are gathered from the parent on access and nothing is copied up front.
+    Views reflect the parent's rows when they were made; sorting the parent invalidates
+    them. Use materialize() to get an independent Transactions.
+    """
+
+    def __init__(self, parent: Transactions, indices: np.ndarray):
+        self.parent = parent
+        self.indices = indices
+
+    @property
+    def vendors(self) -> list[str]:
+        return self.parent.vendors
+
+    @property
+    def categories(self) -> list[str]:
+        return self.parent.categories
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self.parent.dates[self.indices]
+
+    @property
+    def amounts(self) -> np.ndarray:
+        return self.parent.amounts[self.indices]
+
+    @property
+    def vendor_codes(self) -> np.ndarray:
+        return self.parent.vendor_codes[self.indices]
+
+    @property
+    def category_codes(self) -> np.ndarray:
+        return self.parent.category_codes[self.indices]
+
+    def materialize(self) -> Transactions:
+        """
+        Returns:
+            Transactions: A copy of the viewed rows and the parent's dictionaries
+        """
+
+        return self.parent.take(self.indices)
+
+    def _view(self, indices: np.ndarray) -> TransactionsView:
+        return TransactionsView(self.parent, self.indices[indices])
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+
+def _merge_index(order: np.ndarray, keys: np.ndarray, new: np.ndarray, column):
+    """
+    Merge new rows into an index of rows sorted by a column
+
+    Args:
+        order (np.ndarray): Indexed rows, sorted by column value then row
+        keys (np.ndarray): Column values of order
+        new (np.ndarray): Rows to add, all greater than every indexed row
+        column (np.ndarray): The indexed column
 
-        return transactions
+    Returns:
+        tuple: (order, keys) including the new rows
+    """
 
-    def __iter__(self):
-        self._iter_i = 0
-        return self
-
-    def __next__(self):
-        if self._iter_i < len(self.transactions):
-            transaction = self.transactions[self._iter_i]
-            self._iter_i += 1
-            return transaction
-        raise StopIteration
+    new = new[np.argsort(column[new], kind="stable")]
+    new_keys = column[new]
+
+    # Equal keys are inserted after existing ones, keeping rows in order among equals
+    positions = np.searchsorted(keys, new_keys, side="right")
+    return np.insert(order, positions, new), np.insert(keys, positions, new_keys)
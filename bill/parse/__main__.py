@@ -1,6 +1,5 @@
 import argparse
 import os
-from . import tracker
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -25,11 +24,21 @@ if __name__ == "__main__":
         help="Directory of categories.csv to use for categorization. Defalts to ./categories.csv",
         default="./categories.csv",
     )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Write the time, CPU and memory of each stage to this .json file",
+    )
 
     args = parser.parse_args()
 
-    tracker.track(
-        os.path.abspath(args.statement_dir),
-        os.path.abspath(args.output_dir),
-        os.path.abspath(args.category_file),
-    )
+    # Imported after parsing so -h doesn't wait on it
+    from . import tracker
+    from ..utility.profile import profiled
+
+    with profiled(args.profile):
+        tracker.track(
+            os.path.abspath(args.statement_dir),
+            os.path.abspath(args.output_dir),
+            os.path.abspath(args.category_file),
+        )
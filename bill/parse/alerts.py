@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+
+from ..utility.money import Money
+
+DEFAULT_CONFIG = {
+    "budgets": {},  # Category -> monthly budget in dollars
+    "z_threshold": 3.0,  # Standard deviations above the mean to alert on
+    "min_count": 5,  # Charges seen before a category or vendor can alert
+    "method": "welford",  # "welford" for all-time statistics, "ewma" for recent ones
+    "alpha": 0.1,  # Weight of the newest charge in the EWMA statistics
+}
+
+
+class OnlineStats:
+    """
+    Running statistics of a stream of amounts, updated in constant time per amount
+
+    Keeps both the all-time mean and variance (Welford's algorithm) and an
+    exponentially weighted mean and variance, which follow changes in spending.
+    """
+
+    __slots__ = ("n", "mean", "m2", "ewma", "ewvar")
+
+    def __init__(self, n=0, mean=0.0, m2=0.0, ewma=0.0, ewvar=0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.ewvar = ewvar
+
+    def update(self, x: float, alpha: float):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+        if self.n == 1:
+            self.ewma = x
+        else:
+            delta = x - self.ewma
+            self.ewma += alpha * delta
+            self.ewvar = (1 - alpha) * (self.ewvar + alpha * delta * delta)
+
+    def zscore(self, x: float, method: str = "welford") -> float:
+        """
+        Returns:
+            float: Standard deviations x is above the mean, 0 if they're undefined
+        """
+
+        if method == "ewma":
+            mean, variance = self.ewma, self.ewvar
+        else:
+            mean = self.mean
+            variance = self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+        if variance <= 0:
+            return 0.0
+        return (x - mean) / math.sqrt(variance)
+
+    def expected(self, method: str = "welford") -> float:
+        return self.ewma if method == "ewma" else self.mean
+
+    def to_list(self) -> list:
+        return [self.n, self.mean, self.m2, self.ewma, self.ewvar]
+
+
+class AlertMonitor:
+    """
+    Checks a stream of categorized transactions against budgets and past spending
+
+    Statistics are kept per category (and ancestor category) and per vendor, and
+    spending per category and month for the budgets. The state is saved between runs
+    along with the statements it has seen, so each statement is only processed once.
+    """
+
+    def __init__(self, config_file: str | None = None, state_file: str | None = None):
+        """
+        Args:
+            config_file (str | None): .json overriding DEFAULT_CONFIG, if it exists
+            state_file (str | None): .json the state is loaded from, if it exists,
+                and saved to
+        """
+
+        self.config = dict(DEFAULT_CONFIG)
+        if config_file is not None and os.path.isfile(config_file):
+            with open(config_file, "r") as f_stream:
+                self.config.update(json.load(f_stream))
+
+        # Budgets in cents
+        self.budgets = {
+            category: Money.parse(budget).cents
+            for category, budget in self.config["budgets"].items()
+        }
+
+        self.state_file = state_file
+        self.statements: set[str] = set()
+        self.stats: dict[str, OnlineStats] = {}
+        self.spent: dict[str, int] = {}  # "category|mm/yyyy" -> cents
+
+        if state_file is not None and os.path.isfile(state_file):
+            with open(state_file, "r") as f_stream:
+                state = json.load(f_stream)
+
+            self.statements = set(state["statements"])
+            self.stats = {key: OnlineStats(*s) for key, s in state["stats"].items()}
+            self.spent = state["spent"]
+
+    def is_new(self, statement: str) -> bool:
+        return statement not in self.statements
+
+    def mark_seen(self, statement: str):
+        self.statements.add(statement)
+
+    def observe(self, date, amount: Money, vendor: str, category: str) -> list[str]:
+        """
+        Check one transaction, then add it to the statistics
+
+        Args:
+            date (Date): Date of the transaction
+            amount (Money): Amount of the transaction
+            vendor (str): Vendor of the transaction
+            category (str): Category of the transaction, "~" if uncategorized
+
+        Returns:
+            list[str]: Alerts raised by the transaction
+        """
+
+        alerts = []
+        prefix = f"{date} | {vendor} | {amount} | {category}:"
+        method = self.config["method"]
+
+        sub_cats = category.split(".")
+        categories = []
+        while len(sub_cats) > 0 and sub_cats[0] != "~":
+            categories.append(".".join(sub_cats))
+            sub_cats = sub_cats[:-1]
+
+        # Unusual charges, judged against the charges before them
+        if amount.cents > 0:
+            x = float(amount.cents)
+            keys = [f"vendor:{vendor}"] + [f"category:{c}" for c in categories]
+
+            for key in keys:
+                stats = self.stats.setdefault(key, OnlineStats())
+
+                if stats.n >= self.config["min_count"]:
+                    z = stats.zscore(x, method)
+                    if z >= self.config["z_threshold"]:
+                        expected = Money(round(stats.expected(method)))
+                        kind, name = key.split(":", 1)
+                        alerts.append(
+                            f"{prefix} {z:.1f} standard deviations above the "
+                            f"{kind} {name} average of {expected}"
+                        )
+
+                stats.update(x, self.config["alpha"])
+
+        # Budgets, alerting once when a month's spending first goes over
+        month = f"{date.month:0>2}/{date.year:0>4}"
+        for c in categories:
+            key = f"{c}|{month}"
+            before = self.spent.get(key, 0)
+            self.spent[key] = before + amount.cents
+
+            budget = self.budgets.get(c)
+            if budget is not None and before <= budget < self.spent[key]:
+                alerts.append(
+                    f"{prefix} {c} spending for {month} is {Money(self.spent[key])}, "
+                    f"over its budget of {Money(budget)}"
+                )
+
+        return alerts
+
+    def save(self):
+        """
+        Save the state to state_file, replacing it atomically
+        """
+
+        if self.state_file is None:
+            return
+
+        state = {
+            "statements": sorted(self.statements),
+            "stats": {key: s.to_list() for key, s in self.stats.items()},
+            "spent": self.spent,
+        }
+
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, "w") as f_stream:
+            json.dump(state, f_stream)
+        os.replace(tmp, self.state_file)
@@ -0,0 +1,122 @@
+from ..utility.lazy import lazy_import
+
+Levenshtein = lazy_import("Levenshtein")
+
+
+class BKTree:
+    """
+    A Burkhard-Keller tree for finding strings within an edit distance of a query
+
+    Each node stores a key and its children keyed by their distance to that key. The
+    triangle inequality lets a search skip every subtree whose edge distance falls
+    outside [d - k, d + k], so only a small part of the tree is visited for small k.
+    """
+
+    def __init__(self, items=[], metric=None):
+        """
+        Args:
+            items (iterable): (key, value) pairs to insert
+            metric (callable): Integer metric between two keys. Defaults to the
+                Levenshtein distance
+        """
+
+        self.metric = Levenshtein.distance if metric is None else metric
+        self.root = None
+        self.size = 0
+
+        for key, value in items:
+            self.add(key, value)
+
+    def add(self, key: str, value=None):
+        """
+        Insert a key into the tree. The first value stored for a key is kept.
+
+        Args:
+            key (str): The string to index
+            value: Data returned alongside key on a match
+        """
+
+        if self.root is None:
+            self.root = (key, value, {})
+            self.size += 1
+            return
+
+        node = self.root
+        while True:
+            dist = self.metric(key, node[0])
+            if dist == 0:
+                return
+
+            children = node[2]
+            if dist not in children:
+                children[dist] = (key, value, {})
+                self.size += 1
+                return
+
+            node = children[dist]
+
+    def search(self, query: str, k: int) -> list[tuple[int, str, object]]:
+        """
+        Find every key within edit distance k of query
+
+        Args:
+            query (str): The string to look up
+            k (int): Maximum distance of a match
+
+        Returns:
+            list: (distance, key, value) tuples sorted by distance
+        """
+
+        matches = []
+        if self.root is None:
+            return matches
+
+        stack = [self.root]
+        while len(stack) > 0:
+            key, value, children = stack.pop()
+            dist = self.metric(query, key)
+
+            if dist <= k:
+                matches.append((dist, key, value))
+
+            for edge, child in children.items():
+                if dist - k <= edge <= dist + k:
+                    stack.append(child)
+
+        matches.sort(key=lambda m: (m[0], m[1]))
+        return matches
+
+    def nearest(self, query: str, k: int) -> tuple[int, str, object] | None:
+        """
+        Find the closest key within edit distance k of query
+
+        Args:
+            query (str): The string to look up
+            k (int): Maximum distance of a match
+
+        Returns:
+            tuple | None: (distance, key, value) of the closest key, if any
+        """
+
+        best = None
+        if self.root is None:
+            return best
+
+        # Shrink the search radius to the best distance found so far
+        stack = [self.root]
+        while len(stack) > 0:
+            key, value, children = stack.pop()
+            dist = self.metric(query, key)
+
+            if dist <= k and (best is None or (dist, key) < best[:2]):
+                best = (dist, key, value)
+                k = dist
+
+            for edge, child in children.items():
+                if dist - k <= edge <= dist + k:
+                    stack.append(child)
+
+        return best
+
+    def __len__(self):
+        return self.size
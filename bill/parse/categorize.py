@@ -1,11 +1,20 @@
-from Levenshtein import distance
-import numpy as np
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
 import os
+import threading
 
-from ..utility import helpers
+from ..utility import helpers, profile
+from ..utility.lazy import lazy_import
+from .bktree import BKTree
+from . import checkpoint
+from . import rules
 import csv
 import re
 
+np = lazy_import("numpy")
+Levenshtein = lazy_import("Levenshtein")
+
 
 class CategorySelector:
     """
@@ -78,7 +87,7 @@ class CategorySelector:
 
         print("Pick a category or enter a new one:")
         print(self)
-        sym_cat = input("Category: ")
+        sym_cat = profile.prompt("Category: ")
         cat = select_helper(self.structure, sym_cat).rstrip(".")
         print(cat)
         self.add_category(cat)
@@ -86,7 +95,134 @@ class CategorySelector:
         return cat
 
 
-def categorize(transactions, cat_file, write=False):
+class RoundPrefetcher:
+    """
+    Prepare upcoming categorization rounds on a worker thread while the operator types
+
+    A prepared round holds the sorted matches and the closest known vendor for a single
+    vendor. Both are computed against the excluded set and known vendors at the time
+    they were scheduled; when a selection changes either, the stale parts are patched
+    on retrieval instead of recomputing the round.
+    """
+
+    def __init__(
+        self,
+        vendors: list,
+        dist_mat: np.ndarray,
+        known: BKTree,
+        k: int,
+        depth: int = 3,
+    ):
+        """
+        Args:
+            vendors (list): Uncategorized vendors, indexed like dist_mat
+            dist_mat (np.ndarray): Pairwise distance matrix for vendors
+            known (BKTree): Index of categorized vendors and their categories
+            k (int): Maximum edit distance to a known vendor
+            depth (int): How many rounds to prepare ahead
+        """
+
+        self.vendors = vendors
+        self.dist_mat = dist_mat
+        self.known = known
+        self.k = k
+        self.depth = depth
+
+        self.lock = threading.Lock()  # Guards known and added
+        self.added: list = []  # Known vendors added since creation, in order
+        self.pending: dict = {}  # Vendor index -> (future, len(used) when scheduled)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def schedule(self, upcoming: list[int], used: list[int]):
+        """
+        Start preparing the next rounds, dropping any that are no longer upcoming
+
+        Args:
+            upcoming (list[int]): Vendor indices of the next rounds, in order
+            used (list[int]): Vendor indices which are already categorized
+        """
+
+        upcoming = upcoming[: self.depth]
+        for vi in list(self.pending):
+            if vi not in upcoming:
+                self.pending.pop(vi)[0].cancel()
+
+        for vi in upcoming:
+            if vi not in self.pending:
+                future = self.executor.submit(self._prepare, vi, list(used))
+                self.pending[vi] = (future, len(used))
+
+    def get(self, vi: int, used: list[int]):
+        """
+        Return the matches and closest known vendor for the round of vendor vi
+
+        Args:
+            vi (int): Vendor index of the round
+            used (list[int]): Vendor indices which are already categorized
+
+        Returns:
+            tuple: (matches, known_match) as returned by closest_match and closest_known
+        """
+
+        entry = self.pending.pop(vi, None)
+        if entry is None:
+            matches, known_match, n_added = self._prepare(vi, used)
+        else:
+            future, n_used = entry
+            matches, known_match, n_added = future.result()
+
+            # Drop vendors categorized since the round was prepared
+            if n_used < len(used):
+                stale = np.isin(matches[1, :], used[n_used:])
+                matches = matches[:, ~stale]
+
+        # Check known vendors added since the round was prepared
+        vendor = self.vendors[vi].strip()
+        with self.lock:
+            for key, value in self.added[n_added:]:
+                dist = Levenshtein.distance(vendor, key)
+                if dist <= self.k and (
+                    known_match is None or (dist, key) < known_match[:2]
+                ):
+                    known_match = (dist, key, value)
+
+        return matches, known_match
+
+    def closest_known(self, vendors: list[str]):
+        """
+        Thread-safe closest_known against the prefetcher's known vendors
+        """
+
+        with self.lock:
+            return closest_known(vendors, self.known, self.k)
+
+    def add_known(self, vendor: str, category: str):
+        """
+        Add a newly categorized vendor to the known vendors
+
+        Args:
+            vendor (str): The vendor
+            category (str): Its category
+        """
+
+        with self.lock:
+            self.known.add(vendor.strip(), category)
+            self.added.append((vendor.strip(), category))
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _prepare(self, vi: int, used: list[int]):
+        matches = closest_match([vi], self.dist_mat, [vi] + used)
+
+        with self.lock:
+            known_match = closest_known([self.vendors[vi]], self.known, self.k)
+            n_added = len(self.added)
+
+        return matches, known_match, n_added
+
+
+def categorize(transactions, cat_file, write=False, session_file=None):
     uncat_ti: set = set(
         [i for i in range(len(transactions))]
     )  # Uncategorized transactions as indicies for transactions
@@ -105,99 +241,192 @@ def categorize(transactions, cat_file, write=False):
 
     # Check the category file and remove transactions which are already categorized
     file_cats = read_categories(cat_file)
+    rule_set = rules.RuleSet(file_cats)
+
+    # Look for a saved session on the same transactions
+    key = checkpoint.session_key([t["vendor"] for t in transactions])
+    saved = None
+    if session_file is not None:
+        saved = checkpoint.load(session_file, key)
+        if saved is not None:
+            choice = profile.prompt(
+                f"Resume categorization saved in {session_file}? (Y/n): "
+            )
+            if choice != "Y":
+                saved = None
+
+    def save_session():
+        checkpoint.save_state(
+            session_file,
+            {
+                "key": key,
+                "categorized": categorized,
+                "uncat_vendors": uncat_vendors,
+                "ui_ti": ui_ti,
+                "uncat_ui": sorted(uncat_ui),
+                "used": used,
+                "structure": sel.structure,
+            },
+        )
+
+    if saved is None:
+        rule_cats = rule_set.categorize(transactions)
+
+        for i, transaction in enumerate(transactions):
+            cat = rule_cats[i]
+            if cat != "~":
+                uncat_ti.remove(i)
+                categorized[i] = cat
+            else:
+                if transaction["vendor"] not in uncat_vendors:
+                    uncat_vendors.append(transaction["vendor"])
+                    ui_ti[len(uncat_vendors) - 1] = []
+                ui_ti[len(uncat_vendors) - 1].append(i)
+
+        uncat_ui = set([i for i in range(len(uncat_vendors))])
+        used = []
+
+        # Create selector
+        sel = CategorySelector(categorized)
+        for c in file_cats:
+            sel.add_category(".".join(c[1:]))
+
+        # Calculate distances for all pairs
+        dist_mat = distance_matrix(uncat_vendors)
+        if session_file is not None:
+            checkpoint.save_matrix(session_file, dist_mat)
+            # Saved before the first round, so interrupting it still keeps the matrix
+            save_session()
+    else:
+        state, dist_mat = saved
+        categorized = state["categorized"]
+        uncat_vendors = state["uncat_vendors"]
+        ui_ti = {int(ui): tis for ui, tis in state["ui_ti"].items()}
+        uncat_ui = set(state["uncat_ui"])
+        used = state["used"]
 
-    for i, transaction in enumerate(transactions):
-        cat = trans_categorize(transaction["vendor"], file_cats)
-        if cat != "~":
-            uncat_ti.remove(i)
-            categorized[i] = cat
-        else:
-            if transaction["vendor"] not in uncat_vendors:
-                uncat_vendors.append(transaction["vendor"])
-                ui_ti[len(uncat_vendors) - 1] = []
-            ui_ti[len(uncat_vendors) - 1].append(i)
-
-    uncat_ui = set([i for i in range(len(uncat_vendors))])
-    used = []
-
-    # Create selector
-    sel = CategorySelector(categorized)
-    for c in file_cats:
-        sel.add_category(".".join(c[1:]))
+        sel = CategorySelector()
+        sel.structure = state["structure"]
 
-    # Calculate distances for all pairs
-    dist_mat = distance_matrix(uncat_vendors)
+    # Index vendors which already have a category, only needed to prompt for the rest
+    known = BKTree(rule_set.known_vendors() if len(uncat_vendors) > 0 else [])
+    for ui in used:
+        known.add(uncat_vendors[ui].strip(), categorized[ui_ti[ui][0]])
 
     N = 5  # How many matches to show per round
+    K = 3  # Maximum edit distance to a known vendor
     if len(uncat_vendors) > 0:
         VEND_WIDTH = len(max(uncat_vendors, key=len))
     else:
         VEND_WIDTH = 0
 
-    while len(uncat_ui) > 0:
-        vi = uncat_ui.pop()
-        vendor = uncat_vendors[vi]
+    # Rounds are taken in vendor order so the next few can be prepared ahead
+    order = sorted(uncat_ui)
+    prefetcher = RoundPrefetcher(uncat_vendors, dist_mat, known, K)
 
-        vendors = [vi]
-        prev_l = 1
+    try:
+        while len(uncat_ui) > 0:
+            order = [ui for ui in order if ui in uncat_ui]
+            vi = order.pop(0)
+            uncat_ui.remove(vi)
+            prefetcher.schedule(order, used)
 
-        while True:
-            matches = closest_match(vendors, dist_mat, vendors + used)
+            vendor = uncat_vendors[vi]
 
-            nn = min(N, len(uncat_ui))
-            if len(vendors) == 1:
-                print(f"Vendor:\n\t{vendor}")
-            else:
-                print(f"Vendors:")
-                for i in vendors:
-                    print(f"\t{uncat_vendors[i]}")
+            vendors = [vi]
+            prev_l = 1
+            cat = None
 
-            print(
-                f"The closest {nn} matches are ({len(uncat_ui) - len(vendors)} total remaining):"
-            )
-            for i in range(nn):
-                mi = int(matches[1, i])
-                mdist = matches[0, i]
+            while True:
+                if len(vendors) == 1:
+                    matches, known_match = prefetcher.get(vi, used)
+                else:
+                    matches = closest_match(vendors, dist_mat, vendors + used)
+                    known_match = prefetcher.closest_known(
+                        [uncat_vendors[i] for i in vendors]
+                    )
+
+                nn = min(N, matches.shape[1])
+                if len(vendors) == 1:
+                    print(f"Vendor:\n\t{vendor}")
+                else:
+                    print(f"Vendors:")
+                    for i in vendors:
+                        print(f"\t{uncat_vendors[i]}")
 
                 print(
-                    f"\t[{i+1}] {uncat_vendors[mi]:<{VEND_WIDTH}} {helpers.percent_bar(1 - mdist)}"
+                    f"The closest {nn} matches are ({len(uncat_ui) - len(vendors)} total remaining):"
                 )
-
-            selection = input("Matches: ")
-            inds = helpers.parse_num_selection(selection)
-
-            for i in inds:
-                i = i - 1
-                if i < nn and i >= 0:
-                    vendors.append(int(matches[1, i]))
-                else:
-                    raise IndexError(f"{i+1} out of range for selection of length {nn}")
-
-            if len(vendors) == prev_l:
-                break
-
-            prev_l = len(vendors)
-
-        cat = sel.select()
-        print("")
-        for ui in vendors:
-            tis = ui_ti[ui]
-            for ti in tis:
-                categorized[ti] = cat
-            used.append(ui)
-            try:
-                uncat_ui.remove(ui)
-            except:
-                pass
-
-        # write to file
-
-        if write:
-            with open(cat_file, "a+", newline="") as f_stream:
-                writer = csv.writer(f_stream)
-                for ui in vendors:
-                    vend = uncat_vendors[ui]
-                    writer.writerow([vend, *cat.split(".")])
+                for i in range(nn):
+                    mi = int(matches[1, i])
+                    mdist = matches[0, i]
+
+                    print(
+                        f"\t[{i+1}] {uncat_vendors[mi]:<{VEND_WIDTH}} {helpers.percent_bar(1 - mdist)}"
+                    )
+
+                if known_match is not None:
+                    kdist, kvendor, kcat = known_match
+                    print(f"The closest known vendor is (edit distance {kdist}):")
+                    print(f"\t[k] {kvendor:<{VEND_WIDTH}} {kcat}")
+
+                selection = profile.prompt("Matches: ")
+                if known_match is not None and selection.strip().lower() == "k":
+                    cat = known_match[2]
+                    print(cat)
+                    sel.add_category(cat)
+                    break
+
+                inds = helpers.parse_num_selection(selection)
+
+                for i in inds:
+                    i = i - 1
+                    if i < nn and i >= 0:
+                        vendors.append(int(matches[1, i]))
+                    else:
+                        raise IndexError(
+                            f"{i+1} out of range for selection of length {nn}"
+                        )
+
+                if len(vendors) == prev_l:
+                    break
+
+                prev_l = len(vendors)
+
+            if cat is None:
+                cat = sel.select()
+            print("")
+            for ui in vendors:
+                tis = ui_ti[ui]
+                for ti in tis:
+                    categorized[ti] = cat
+                used.append(ui)
+                prefetcher.add_known(uncat_vendors[ui], cat)
+                try:
+                    uncat_ui.remove(ui)
+                except:
+                    pass
+
+            # write to file
+
+            if write:
+                with open(cat_file, "a+", newline="") as f_stream:
+                    writer = csv.writer(f_stream)
+                    for ui in vendors:
+                        vend = uncat_vendors[ui]
+                        writer.writerow([vend, *cat.split(".")])
+
+            if session_file is not None:
+                save_session()
+    except BaseException:
+        if session_file is not None and os.path.isfile(session_file):
+            print(f"\nCategorization progress saved to {session_file}")
+        raise
+    finally:
+        prefetcher.close()
+
+    if session_file is not None:
+        checkpoint.clear(session_file)
 
     # Cleanup
 
@@ -245,11 +474,34 @@ def closest_match(
 
     sort = np.vstack((dist_vect, ind_vect))
     sort = np.delete(sort, exclude, axis=1)
-    raw_matches = sort[:, sort[0, :].argsort()]
+    raw_matches = sort[:, sort[0, :].argsort(kind="stable")]
 
     return raw_matches
 
 
+def closest_known(vendors: list[str], known: BKTree, k: int):
+    """
+    Return the categorized vendor closest to any of a group of vendors
+
+    Args:
+        vendors (list[str]): The vendors to look up
+        known (BKTree): Index of categorized vendors and their categories
+        k (int): Maximum edit distance of a match
+
+    Returns:
+        tuple | None: (distance, vendor, category) of the closest match, if any
+    """
+
+    best = None
+    for vendor in vendors:
+        match = known.nearest(vendor.strip(), k)
+        if match is not None and (best is None or match[0] < best[0]):
+            best = match
+            k = match[0]
+
+    return best
+
+
 def distance_matrix(vendors: list):
     """
     Calculate a pairwise (Levenshtein) distance matrix for a list of vendors
@@ -262,13 +514,16 @@ def distance_matrix(vendors: list):
     """
     dist_mat = np.zeros((len(vendors), len(vendors)))
 
-    for i in range(len(vendors)):
-        vend_1 = vendors[i]
-        for j in range(i + 1, len(vendors)):
-            vend_2 = vendors[j]
-            dist = distance(vend_1, vend_2) / max(len(vend_1), len(vend_2))
-            dist_mat[i, j] = dist
-            dist_mat[j, i] = dist
+    with profile.span("categorize.distances", vendors=len(vendors)):
+        for i in range(len(vendors)):
+            vend_1 = vendors[i]
+            for j in range(i + 1, len(vendors)):
+                vend_2 = vendors[j]
+                dist = Levenshtein.distance(vend_1, vend_2) / max(
+                    len(vend_1), len(vend_2)
+                )
+                dist_mat[i, j] = dist
+                dist_mat[j, i] = dist
 
     return dist_mat
 
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+from ..utility.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+def session_key(vendors: list[str]) -> str:
+    """
+    Returns a key identifying the transactions a categorization session was run on
+
+        Parameters:
+            vendors (list[str]): Vendor of every transaction, in order
+
+        Returns:
+            str: Hex digest of the vendors
+    """
+
+    digest = hashlib.sha256()
+    for vendor in vendors:
+        digest.update(vendor.encode())
+        digest.update(b"\n")
+
+    return digest.hexdigest()
+
+
+def matrix_path(checkpoint: str) -> str:
+    return f"{checkpoint}.npy"
+
+
+def save_matrix(checkpoint: str, dist_mat: np.ndarray):
+    """
+    Save the distance matrix of a session. Written once, as it never changes.
+
+        Parameters:
+            checkpoint (str): Path of the checkpoint file
+            dist_mat (np.ndarray): Pairwise distance matrix for uncategorized vendors
+    """
+
+    tmp = f"{checkpoint}.tmp.npy"
+    np.save(tmp, dist_mat)
+    os.replace(tmp, matrix_path(checkpoint))
+
+
+def save_state(checkpoint: str, state: dict):
+    """
+    Save the state of a session after a round. The file is replaced atomically, so an
+    interrupted write leaves the previous round intact.
+
+        Parameters:
+            checkpoint (str): Path of the checkpoint file
+            state (dict): JSON serializable session state, including its "key"
+    """
+
+    tmp = f"{checkpoint}.tmp"
+    with open(tmp, "w") as f_stream:
+        json.dump(state, f_stream)
+    os.replace(tmp, checkpoint)
+
+
+def load(checkpoint: str, key: str):
+    """
+    Load a saved session if it was run on the same transactions
+
+        Parameters:
+            checkpoint (str): Path of the checkpoint file
+            key (str): session_key of the current transactions
+
+        Returns:
+            tuple | None: (state, dist_mat) of the saved session, if any
+    """
+
+    if not os.path.isfile(checkpoint) or not os.path.isfile(matrix_path(checkpoint)):
+        return None
+
+    try:
+        with open(checkpoint, "r") as f_stream:
+            state = json.load(f_stream)
+    except ValueError:
+        return None
+
+    if state.get("key") != key:
+        return None
+
+    dist_mat = np.load(matrix_path(checkpoint), allow_pickle=False)
+    return state, dist_mat
+
+
+def clear(checkpoint: str):
+    """
+    Remove a session checkpoint once the session is complete
+
+        Parameters:
+            checkpoint (str): Path of the checkpoint file
+    """
+
+    for path in [checkpoint, matrix_path(checkpoint)]:
+        if os.path.exists(path):
+            os.remove(path)
@@ -1,7 +1,12 @@
-from pypdf import PdfReader
+from __future__ import annotations
+
 import re
-from ..utility import helpers
+from ..utility import helpers, profile
+from ..utility.money import Money
 import csv
+from ..utility.lazy import lazy_import
+
+pypdf = lazy_import("pypdf")
 
 
 def parse(statement_path):
@@ -19,14 +24,16 @@ def parse(statement_path):
     bank, year, month = info["bank"], info["year"], info["month"]
 
     transactions = []
-    if bank == "PNC":
-        transactions = pnc_parse(statement_path)
-    elif bank == "Chase":
-        transactions = chase_parse(statement_path)
-    elif bank == "FNB":
-        transactions = fnb_parse(statement_path)
-    elif bank == "Discover":
-        transactions = discover_parse(statement_path)
+    with profile.span("parse.visit", bank=bank) as span:
+        if bank == "PNC":
+            transactions = pnc_parse(statement_path)
+        elif bank == "Chase":
+            transactions = chase_parse(statement_path)
+        elif bank == "FNB":
+            transactions = fnb_parse(statement_path)
+        elif bank == "Discover":
+            transactions = discover_parse(statement_path)
+        span.count(transactions=len(transactions))
 
     for i, trans in enumerate(transactions):
         local_year = year
@@ -36,12 +43,13 @@ def parse(statement_path):
                 local_year = year - 1
 
         transactions[i]["date"] = f"{trans['date']}/{local_year}"
+        transactions[i]["bank"] = bank
 
     return transactions
 
 
 def chase_parse(statement_path):
-    reader = PdfReader(statement_path)
+    reader = pypdf.PdfReader(statement_path)
 
     transactions = []
 
@@ -55,7 +63,7 @@ def chase_parse(statement_path):
             {
                 "date": groups.group(1),
                 "vendor": groups.group(2),
-                "amount": float(groups.group(3)),
+                "amount": Money.parse(groups.group(3)),
             }
         )
 
@@ -66,7 +74,7 @@ def chase_parse(statement_path):
 
 
 def pnc_parse(statement_path):
-    reader = PdfReader(statement_path)
+    reader = pypdf.PdfReader(statement_path)
 
     transactions = []
 
@@ -112,7 +120,7 @@ def pnc_parse(statement_path):
             curr_transaction["date"] = date.string
         elif amount is not None:
             if curr_transaction["date"] is not None:
-                curr_transaction["amount"] = helpers.to_float(amount.string)
+                curr_transaction["amount"] = Money.parse(amount.string)
             else:
                 for key in curr_transaction:
                     curr_transaction[key] = None
@@ -145,7 +153,7 @@ def pnc_parse(statement_path):
 
 
 def fnb_parse(statement_path):
-    reader = PdfReader(statement_path)
+    reader = pypdf.PdfReader(statement_path)
 
     below_header = [False]
     transactions = []
@@ -173,8 +181,8 @@ def fnb_parse(statement_path):
                 curr_transaction["date"] = date.group(1)
                 curr_transaction["vendor"] = date.group(2)
             if price is not None:
-                amount = helpers.to_float(price.group(1))
-                balance = helpers.to_float(price.group(2))
+                amount = Money.parse(price.group(1))
+                balance = Money.parse(price.group(2))
 
                 neg = False
                 if prev_balance[0] is not None:
@@ -202,13 +210,17 @@ def discover_parse(statement_path):
         for i, line in enumerate(reader):
             if i != 0:
                 transactions.append(
-                    {"date": line[0][:-5], "amount": line[3], "vendor": line[2]}
+                    {
+                        "date": line[0][:-5],
+                        "amount": Money.parse(line[3]),
+                        "vendor": line[2],
+                    }
                 )
 
     return transactions
 
 
-def _parse(reader: PdfReader):
+def _parse(reader: pypdf.PdfReader):
     """
     Template parser
 
@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import re
+
+from ..utility import profile
+from ..utility.lazy import lazy_import
+from ..utility.money import Money
+from ..utility.date import Date
+
+np = lazy_import("numpy")
+
+PREDICATE = re.compile("^\\s*(amount|date|day|bank)\\s*=\\s*(.*?)\\s*$")
+WILDCARD = "*"
+CHUNK = 1 << 20  # Maximum cells of a (transactions, rules) mask evaluated at once
+
+
+def parse_rule(pattern: str):
+    """
+    Split the first column of a category line into a vendor and its predicates
+
+    Predicates follow the vendor, separated by ";":
+
+        VENMO; amount=500..2000; day=1..5; bank=PNC; date=01/01/2024..06/30/2024
+
+    amount, date and day take a single value or an inclusive range "lo..hi", where
+    either end may be left open. A vendor of "*" matches every vendor. Segments which
+    are not a predicate are kept as part of the vendor.
+
+        Parameters:
+            pattern (str): The first column of a category line
+
+        Returns:
+            tuple: (vendor, predicates) where predicates maps a name to its bounds
+    """
+
+    segments = pattern.split(";")
+    vendor = [segments[0]]
+    predicates = {}
+
+    for segment in segments[1:]:
+        groups = PREDICATE.search(segment)
+        if groups is None:
+            vendor.append(segment)
+            continue
+
+        name, value = groups.group(1), groups.group(2)
+        if name == "bank":
+            predicates[name] = value
+        elif name == "amount":
+            predicates[name] = _parse_range(value, lambda a: Money.parse(a).cents)
+        elif name == "date":
+            predicates[name] = _parse_range(value, lambda d: Date(d).to_int())
+        elif name == "day":
+            predicates[name] = _parse_range(value, int)
+
+    return ";".join(vendor).strip(), predicates
+
+
+def _parse_range(value: str, convert):
+    lo, sep, hi = value.partition("..")
+    if sep == "":
+        hi = lo
+
+    try:
+        lo = convert(lo) if lo.strip() != "" else None
+        hi = convert(hi) if hi.strip() != "" else None
+    except ValueError:
+        raise ValueError(f"Malformed range {value}")
+
+    return lo, hi
+
+
+class RuleSet:
+    """
+    Category rules compiled for evaluation over whole batches of transactions
+
+    Rules without predicates are resolved with a single lookup per vendor. Rules with
+    predicates are grouped by vendor, and each group is evaluated as one boolean mask of
+    shape (transactions, rules) whose first true column is the matching rule. The first
+    matching rule in file order always wins.
+    """
+
+    def __init__(self, categories: list):
+        """
+        Parameters:
+            categories (list): Category lines in the form
+                (pattern, category, subcategory, ...)
+        """
+
+        self.categories = []  # Category string by rule index
+        self.plain = {}  # Vendor -> index of its first rule without predicates
+        self.wildcard = None  # Index of the first "*" rule without predicates
+        self.conditional = {}  # Vendor -> compiled predicate arrays
+
+        raw: dict = {}
+        for i, line in enumerate(categories):
+            vendor, predicates = parse_rule(line[0])
+            self.categories.append(".".join([c.strip() for c in line[1:]]))
+
+            if len(predicates) == 0:
+                if vendor == WILDCARD:
+                    if self.wildcard is None:
+                        self.wildcard = i
+                elif vendor not in self.plain:
+                    self.plain[vendor] = i
+            else:
+                raw.setdefault(vendor, []).append((i, predicates))
+
+        for vendor, rules in raw.items():
+            self.conditional[vendor] = _compile(rules)
+
+    def known_vendors(self):
+        """
+        Returns:
+            list: (vendor, category) of every rule which depends only on the vendor
+        """
+
+        return [(vendor, self.categories[i]) for vendor, i in self.plain.items()]
+
+    def evaluate(
+        self,
+        vendors: list[str],
+        amounts: np.ndarray,
+        dates: np.ndarray,
+        days: np.ndarray,
+        banks: list,
+    ) -> np.ndarray:
+        """
+        Find the first matching rule for each of a batch of transactions
+
+        Parameters:
+            vendors (list[str]): Vendor of each transaction
+            amounts (np.ndarray): Amount of each transaction in cents
+            dates (np.ndarray): Date of each transaction as Date.to_int()
+            days (np.ndarray): Day of the month of each transaction
+            banks (list): Source bank of each transaction, or None
+
+        Returns:
+            np.ndarray: Index of the matching rule for each transaction, or -1
+        """
+
+        n = len(vendors)
+        none = len(self.categories)
+
+        vendor_codes: dict = {}
+        inv = np.fromiter(
+            (vendor_codes.setdefault(v.strip(), len(vendor_codes)) for v in vendors),
+            dtype=np.int64,
+            count=n,
+        )
+        bank_codes: dict = {}
+        bank_inv = np.fromiter(
+            (bank_codes.setdefault(b, len(bank_codes)) for b in banks),
+            dtype=np.int64,
+            count=n,
+        )
+
+        # Rules which depend only on the vendor
+        plain_best = np.full(len(vendor_codes), none, dtype=np.int64)
+        for vendor, code in vendor_codes.items():
+            if vendor in self.plain:
+                plain_best[code] = self.plain[vendor]
+
+        result = plain_best[inv]
+        if self.wildcard is not None:
+            result = np.minimum(result, self.wildcard)
+
+        if len(self.conditional) == 0:
+            return np.where(result == none, -1, result)
+
+        # Group transactions by vendor with one stable sort
+        order = np.argsort(inv, kind="stable")
+        bounds = np.concatenate(
+            ([0], np.cumsum(np.bincount(inv, minlength=len(vendor_codes))))
+        )
+        columns = (amounts, dates, days, bank_inv)
+
+        for vendor, compiled in self.conditional.items():
+            if vendor == WILDCARD:
+                rows = np.arange(n)
+            elif vendor in vendor_codes:
+                code = vendor_codes[vendor]
+                rows = order[bounds[code] : bounds[code + 1]]
+            else:
+                continue
+
+            step = max(1, CHUNK // len(compiled["rule"]))
+            for start in range(0, len(rows), step):
+                chunk = rows[start : start + step]
+                match = _match(compiled, columns, chunk, bank_codes)
+                result[chunk] = np.minimum(result[chunk], match)
+
+        return np.where(result == none, -1, result)
+
+    def categorize(self, transactions: list) -> list[str]:
+        """
+        Categorize a batch of transactions
+
+        Parameters:
+            transactions (list): Transactions with a vendor, date, amount and
+                optional bank
+
+        Returns:
+            list[str]: The first matched category of each transaction, or "~"
+        """
+
+        n = len(transactions)
+        vendors = [t["vendor"] for t in transactions]
+        banks = [t.get("bank") for t in transactions]
+
+        amounts = np.zeros(n, dtype=np.int64)
+        dates = np.zeros(n, dtype=np.int64)
+        days = np.zeros(n, dtype=np.int64)
+
+        if len(self.conditional) > 0:
+            for i, t in enumerate(transactions):
+                amount, date = t["amount"], t["date"]
+                if isinstance(date, str):
+                    date = Date(date)
+
+                amounts[i] = Money.parse(amount).cents
+                dates[i] = date.to_int()
+                days[i] = date.day
+
+        with profile.span(
+            "categorize.rules", transactions=n, rules=len(self.categories)
+        ):
+            matches = self.evaluate(vendors, amounts, dates, days, banks)
+        return [self.categories[m] if m >= 0 else "~" for m in matches]
+
+
+def _compile(rules: list) -> dict:
+    """
+    Pack the predicates of a vendor's rules into bound arrays, one entry per rule
+    """
+
+    n = len(rules)
+    compiled = {
+        "rule": np.array([i for i, _ in rules], dtype=np.int64),
+        "amount": (
+            np.full(n, np.iinfo(np.int64).min),
+            np.full(n, np.iinfo(np.int64).max),
+        ),
+        "date": (
+            np.full(n, np.iinfo(np.int64).min),
+            np.full(n, np.iinfo(np.int64).max),
+        ),
+        "day": (np.full(n, 1, dtype=np.int64), np.full(n, 31, dtype=np.int64)),
+        "bank": [None] * n,
+    }
+
+    for j, (_, predicates) in enumerate(rules):
+        for name, bounds in predicates.items():
+            if name == "bank":
+                compiled["bank"][j] = bounds
+                continue
+
+            lo, hi = bounds
+            if lo is not None:
+                compiled[name][0][j] = lo
+            if hi is not None:
+                compiled[name][1][j] = hi
+
+    return compiled
+
+
+def _match(compiled: dict, columns: tuple, rows: np.ndarray, bank_codes: dict):
+    """
+    Returns the first matching rule index of compiled for each of rows
+    """
+
+    amounts, dates, days, banks = columns
+    mask = np.ones((len(rows), len(compiled["rule"])), dtype=bool)
+
+    for name, column in (("amount", amounts), ("date", dates), ("day", days)):
+        lo, hi = compiled[name]
+        values = column[rows][:, None]
+        mask &= (values >= lo) & (values <= hi)
+
+    # Banks which never appear can't match; -2 never equals a code
+    bank = np.array(
+        [-1 if b is None else bank_codes.get(b, -2) for b in compiled["bank"]]
+    )
+    mask &= (bank == -1) | (banks[rows][:, None] == bank)
+
+    hit = mask.any(axis=1)
+    first = compiled["rule"][mask.argmax(axis=1)]
+
+    return np.where(hit, first, np.iinfo(np.int64).max)
@@ -1,13 +1,30 @@
 import os
 from . import parser
 import csv
-from ..utility import helpers
+from ..utility import helpers, partition, profile, store
+from ..utility.lazy import lazy_import
 import shutil
 from . import categorize
-from ..utility.date import Date
+from .alerts import AlertMonitor
+from ..utility.date import Date, to_ordinals
+
+np = lazy_import("numpy")
 
 
 def track(in_dir, out_dir, cat_file):
+    """
+    Parse and categorize every statement in in_dir, writing the results to out_dir
+
+        Parameters:
+            in_dir (str): Directory containing bank statements
+            out_dir (str): Directory to write all_transactions.csv and the rest into
+            cat_file (str): categories.csv to categorize with
+
+        Returns:
+            dict | None: Arguments of Transactions.from_columns for the categorized
+                transactions in date order, or None if nothing was written
+    """
+
     print(f"Reading statements from {in_dir}")
 
     # Read categories if the file exists
@@ -30,16 +47,26 @@ def track(in_dir, out_dir, cat_file):
     # Clear/create output directory
     if os.path.exists(out_dir):
         if os.path.isdir(out_dir):
-            choice = input(f"Preparing to delete {out_dir} Deletion ok? (Y/n) ")
+            choice = profile.prompt(
+                f"Preparing to delete {out_dir} Deletion ok? (Y/n) "
+            )
             if choice != "Y":
                 print(f"Cannot output to {out_dir}. Exiting")
                 return
 
-            shutil.rmtree(out_dir)
+            # Partitioned history is kept, so only changed partitions are rewritten
+            for entry in os.listdir(out_dir):
+                path = os.path.join(out_dir, entry)
+                if entry == "history":
+                    continue
+                elif os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
         else:
             raise TypeError("Output directory must not be a file.")
-
-    os.mkdir(out_dir)
+    else:
+        os.mkdir(out_dir)
 
     # Read Transactions
     all_trans = []
@@ -50,41 +77,173 @@ def track(in_dir, out_dir, cat_file):
             raise TypeError("Input directory must not be a file.")
 
         for statement in os.listdir(in_dir):
-            trans = parser.parse(os.path.join(in_dir, statement))
-
-            for t in trans:
-                vendor, date, amount = t["vendor"], Date(t["date"]), t["amount"]
-                all_trans_dict.append(
-                    {"vendor": vendor, "date": date, "amount": amount}
-                )
-                all_trans.append((date, amount, vendor))
+            for t in read_statement(in_dir, statement):
+                all_trans_dict.append(t)
+                all_trans.append((t["date"], t["amount"], t["vendor"]))
 
         all_trans.sort(key=lambda t: t[0].to_int())
         all_trans_dict.sort(key=lambda t: t["date"].to_int())
 
+    if len(all_trans) == 0:
+        print("0 transactions found. Exiting")
+        return
+
     # categorize
     print("Transactions read.")
-    choice = input("Save categorizations to cat_file? (Y/n): ")
+    choice = profile.prompt("Save categorizations to cat_file? (Y/n): ")
     write = choice == "Y"
-    cats = categorize.categorize(all_trans_dict, cat_file, write)
+    session_file = os.path.join(os.path.dirname(cat_file), "categorize_session.json")
+    with profile.span("categorize", transactions=len(all_trans_dict)):
+        cats = categorize.categorize(all_trans_dict, cat_file, write, session_file)
 
     for i in range(len(all_trans)):
         trans = (*all_trans[i], cats[i])
         all_trans[i] = trans
 
-    if len(all_trans) > 0:
-        print(f"{len(all_trans)} transactions found. Writing to {out_dir}")
-    else:
-        print("0 transactions found. Exiting")
-        return
+    print(f"{len(all_trans)} transactions found. Writing to {out_dir}")
+
+    columns = write_outputs(out_dir, all_trans)
+
+    # Check new statements for unusual charges and budgets
+    monitor = AlertMonitor(
+        os.path.join(os.path.dirname(cat_file), "alerts.json"),
+        os.path.join(os.path.dirname(cat_file), "alerts_state.json"),
+    )
+    check_alerts(monitor, all_trans_dict, cats, out_dir)
+
+    write_uncategorized(out_dir, all_trans)
+
+    return columns
+
+
+def read_statement(in_dir, statement):
+    """
+    Parse one statement into transactions
+
+        Parameters:
+            in_dir (str): Directory containing bank statements
+            statement (str): File name of the statement in in_dir
+
+        Returns:
+            list[dict]: "vendor", "date", "amount", "bank" and "statement" of each
+                transaction
+    """
+
+    with profile.span("parse.statement", statement=statement) as span:
+        trans = parser.parse(os.path.join(in_dir, statement))
+        span.count(transactions=len(trans))
+
+        return [
+            {
+                "vendor": t["vendor"],
+                "date": Date(t["date"]),
+                "amount": t["amount"],
+                "bank": t["bank"],
+                "statement": statement,
+            }
+            for t in trans
+        ]
+
+
+def write_outputs(out_dir, all_trans):
+    """
+    Write all_transactions.csv, all_transactions.bill and the history partitions
+
+        Parameters:
+            out_dir (str): Output directory
+            all_trans (list): (date, amount, vendor, category) of each transaction,
+                in date order
+
+        Returns:
+            dict: Arguments of Transactions.from_columns for all_trans
+    """
 
     # Write to output file
-    with open(
+    with profile.span("write.csv", rows=len(all_trans)), open(
         os.path.join(out_dir, "all_transactions.csv"), "w", newline=""
     ) as f_stream:
         writer = csv.writer(f_stream)
         writer.writerows(all_trans)
 
+    # Write the binary store the analyze stage reads
+    dates = to_ordinals(t[0] for t in all_trans)
+    amounts = np.fromiter((t[1].cents for t in all_trans), np.int64, len(all_trans))
+    vendors = [t[2] for t in all_trans]
+    category_names = [t[3] for t in all_trans]
+
+    vendor_codes, vendor_dict = store.encode(vendors)
+    category_codes, category_dict = store.encode(category_names)
+    columns = {
+        "dates": dates,
+        "amounts": amounts,
+        "vendor_codes": vendor_codes,
+        "vendors": vendor_dict,
+        "category_codes": category_codes,
+        "categories": category_dict,
+    }
+    with profile.span("write.store", rows=len(all_trans)):
+        store.write(
+            os.path.join(out_dir, "all_transactions.bill"), **columns, is_sorted=True
+        )
+
+    with profile.span("write.history", rows=len(all_trans)) as span:
+        written = partition.write(
+            os.path.join(out_dir, "history"), dates, amounts, vendors, category_names
+        )
+        span.count(partitions=len(written))
+    print(f"{len(written)} history partitions updated")
+
+    return columns
+
+
+def check_alerts(monitor, all_trans_dict, cats, out_dir):
+    """
+    Check the transactions of statements monitor hasn't seen, writing any alerts to
+    alerts.txt in out_dir
+
+        Parameters:
+            monitor (AlertMonitor): Monitor to check with, saved afterwards
+            all_trans_dict (list[dict]): Transactions, with their "statement"
+            cats (list[str]): Category of each transaction
+            out_dir (str): Output directory
+
+        Returns:
+            list[str]: The alerts raised
+    """
+
+    alerts = []
+    for trans, cat in zip(all_trans_dict, cats):
+        if monitor.is_new(trans["statement"]):
+            alerts.extend(
+                monitor.observe(trans["date"], trans["amount"], trans["vendor"], cat)
+            )
+
+    for trans in all_trans_dict:
+        monitor.mark_seen(trans["statement"])
+    monitor.save()
+
+    if len(alerts) > 0:
+        print(f"Warning: {len(alerts)} alerts raised:")
+        print("\n".join(alerts))
+
+        with open(os.path.join(out_dir, "alerts.txt"), "w") as f_stream:
+            f_stream.write("\n".join(alerts))
+
+        print(f"Alerts written to {os.path.join(out_dir, 'alerts.txt')}")
+
+    return alerts
+
+
+def write_uncategorized(out_dir, all_trans):
+    """
+    Write the uncategorized vendors of all_trans to uncategorized.txt in out_dir, or
+    remove it if there are none
+
+        Parameters:
+            out_dir (str): Output directory
+            all_trans (list): (date, amount, vendor, category) of each transaction
+    """
+
     # Check for uncategorized vendors
     uncat = dict()
     for trans in all_trans:
@@ -119,3 +278,5 @@ def track(in_dir, out_dir, cat_file):
         print(
             f"Uncategorized vendors written to {os.path.join(out_dir, 'uncategorized.txt')}"
         )
+    elif os.path.isfile(os.path.join(out_dir, "uncategorized.txt")):
+        os.remove(os.path.join(out_dir, "uncategorized.txt"))
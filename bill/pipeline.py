@@ -0,0 +1,54 @@
+import os
+
+from .analyze import create_doc
+from .analyze.transactions import Transactions
+from .parse import tracker
+
+
+def run(
+    in_dir: str,
+    out_dir: str,
+    cat_file: str,
+    xlsx_file: str | None = None,
+    cube_file: str | None = None,
+    constant_memory: bool = False,
+):
+    """
+    Parse, categorize and export in one process
+
+    The categorized columns go straight from the tracker into the workbook, so the
+    all_transactions.csv the tracker writes is never read back.
+
+        Parameters:
+            in_dir (str): Directory containing bank statements
+            out_dir (str): Directory to write all_transactions.csv and the rest into
+            cat_file (str): categories.csv to categorize with
+            xlsx_file (str | None): Workbook to write. Defaults to bills.xlsx in
+                out_dir
+            cube_file (str | None): Rollup cube to keep the week and month totals in
+            constant_memory (bool): Stream the workbook's rows to disk
+
+        Returns:
+            Transactions | None: The categorized transactions, or None if there were
+                none to export
+    """
+
+    columns = tracker.track(in_dir, out_dir, cat_file)
+    if columns is None:
+        return None
+
+    if xlsx_file is None:
+        xlsx_file = os.path.join(out_dir, "bills.xlsx")
+
+    transactions = Transactions.from_columns(**columns)
+
+    cube = None
+    if cube_file is not None:
+        cube, _ = create_doc.load_cube(
+            cube_file, os.path.join(out_dir, "history"), transactions
+        )
+
+    print(f"Writing {xlsx_file}")
+    create_doc.write_workbook(transactions, xlsx_file, None, constant_memory, cube=cube)
+
+    return transactions
@@ -1,11 +1,62 @@
 from __future__ import annotations
 
 from functools import total_ordering
+from numbers import Integral
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Date.to_int() of 01/01/0000, as a Julian day number minus one
+_JDN_OFFSET = 1721059
+
+
+def _to_ordinal(year, month, day):
+    """
+    Closed-form Date.to_int() of a date in the proleptic Gregorian calendar
+
+    Uses only integer arithmetic, so it works on ints and integer arrays alike.
+    """
+
+    a = (14 - month) // 12
+    y = year + 4800 - a
+    m = month + 12 * a - 3
+
+    jdn = day + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045
+    return jdn - _JDN_OFFSET
+
+
+def _from_ordinal(rank):
+    """
+    Closed-form inverse of _to_ordinal, returning (year, month, day)
+
+    Uses only integer arithmetic, so it works on ints and integer arrays alike.
+    """
+
+    a = rank + _JDN_OFFSET + 32044
+    b = (4 * a + 3) // 146097
+    c = a - 146097 * b // 4
+    d = (4 * c + 3) // 1461
+    e = c - 1461 * d // 4
+    m = (5 * e + 2) // 153
+
+    day = e - (153 * m + 2) // 5 + 1
+    month = m + 3 - 12 * (m // 10)
+    year = 100 * b + d - 4800 + m // 10
+
+    return year, month, day
 
 
 @total_ordering
 class Date:
+    """
+    An immutable calendar date backed by its day number (Date.to_int())
+    """
+
+    __slots__ = ("month", "day", "year", "leap", "_rank", "_week")
+
     MONDAY_MOD = 3
+    EPOCH = _to_ordinal(1900, 1, 1)
     DAYS = [
         "Monday",
         "Tuesday",
@@ -32,55 +83,56 @@ class Date:
 
     def __init__(self, date_str: str):
         mo, da, yr = date_str.split("/")
+        self._set(int(yr), int(mo), int(da))
 
-        self.month = int(mo)
-        self.day = int(da)
-        self.year = int(yr)
-        self.leap = Date.is_leap(self.year)
+    def _set(self, year: int, month: int, day: int, rank: int | None = None):
+        if rank is None:
+            rank = _to_ordinal(year, month, day)
 
-    def to_int(self) -> int:
-        days = 0
-        for i in range(1, self.month):
-            days += Date.month_days(i, self.year)
+        set_slot = object.__setattr__
+        set_slot(self, "month", month)
+        set_slot(self, "day", day)
+        set_slot(self, "year", year)
+        set_slot(self, "leap", year % 4 == 0 and (year % 100 != 0 or year % 400 == 0))
+        set_slot(self, "_rank", rank)
+        set_slot(self, "_week", None)
 
-        for i in range(self.year):
-            days += 365 + Date.is_leap(i)
+    def __setattr__(self, name, value):
+        raise AttributeError("Date is immutable")
 
-        return days + self.day
+    def __delattr__(self, name):
+        raise AttributeError("Date is immutable")
 
-    def to_week(self) -> Date:
-        mod = self.to_int() % 7
-        week_rank = self.to_int() - mod + Date.MONDAY_MOD
+    def __reduce__(self):
+        return (Date, (repr(self),))
 
-        monday = Date.from_int(week_rank)
+    def to_int(self) -> int:
+        return self._rank
 
-        return monday
+    def weekday(self) -> int:
+        """
+        Returns:
+            int: Index of the day of the week in Date.DAYS
+        """
 
-    def next_day(self) -> Date:
-        day = self.day + 1
-        month = self.month
-        year = self.year
+        return (self._rank - Date.MONDAY_MOD) % 7
 
-        if day > Date.month_days(self.month, self.year):
-            day = 1
-            month += 1
+    def to_week(self) -> Date:
+        if self._week is None:
+            mod = self._rank % 7
+            week = Date.from_int(self._rank - mod + Date.MONDAY_MOD)
+            object.__setattr__(self, "_week", week)
 
-        if month > 12:
-            month = 1
-            year += 1
+        return self._week
 
-        return Date(f"{month}/{day}/{year}")
+    def next_day(self) -> Date:
+        return Date.from_int(self._rank + 1)
 
     def next_week(self) -> Date:
-        week = self
-
-        for _ in range(7):
-            week = week.next_day()
-
-        return week
+        return Date.from_int(self._rank + 7)
 
     def since_epoch(self) -> int:
-        return self.to_int() - Date("01/01/1900").to_int() + 1
+        return self._rank - Date.EPOCH + 1
 
     def __repr__(self) -> str:
         return f"{self.month:0>2}/{self.day:0>2}/{self.year:0>4}"
@@ -89,20 +141,16 @@ class Date:
         if not isinstance(other, Date):
             return NotImplemented
 
-        return (
-            self.month == other.month
-            and self.day == other.day
-            and self.year == other.year
-        )
+        return self._rank == other._rank
 
     def __lt__(self, other: object) -> bool:
         if not isinstance(other, Date):
             return NotImplemented
 
-        return self.to_int() < other.to_int()
+        return self._rank < other._rank
 
     def __hash__(self) -> int:
-        return self.to_int()
+        return self._rank
 
     @staticmethod
     def is_leap(year: int) -> bool:
@@ -125,14 +173,147 @@ class Date:
 
     @staticmethod
     def from_int(rank: int) -> Date:
-        year = 0
-        while rank > 365 + Date.is_leap(year):
-            rank -= 365 + Date.is_leap(year)
-            year += 1
+        rank = int(rank)
+        year, month, day = _from_ordinal(rank)
+
+        date = Date.__new__(Date)
+        date._set(year, month, day, rank)
+        return date
+
+
+def day_number(date: Date | str | int) -> int:
+    """
+    Returns the day number (Date.to_int()) of a Date, a "mm/dd/yyyy" string, or a day
+    number, which is returned as is
+    """
+
+    if isinstance(date, Integral):
+        return date
+    if not isinstance(date, Date):
+        date = Date(date)
+    return date.to_int()
+
+
+# Vectorized calendar engine. Dates are held as int32 arrays of Date.to_int() values,
+# and the functions below work on whole columns at once.
+
+_UNIX_EPOCH = _to_ordinal(1970, 1, 1)
+
+
+def parse_dates(date_strs) -> np.ndarray:
+    """
+    Parse a column of "mm/dd/yyyy" strings in one pass
+
+        Parameters:
+            date_strs (iterable): Date strings, as accepted by Date
+
+        Returns:
+            np.ndarray: int32 day numbers, as Date.to_int()
+    """
+
+    date_strs = list(date_strs)
+    if len(date_strs) == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    parts = np.array("/".join(date_strs).split("/"), dtype=np.int64)
+    if parts.size != 3 * len(date_strs):
+        raise ValueError("Dates must be in the form mm/dd/yyyy")
+
+    mdy = parts.reshape(-1, 3)
+    return _to_ordinal(mdy[:, 2], mdy[:, 0], mdy[:, 1]).astype(np.int32)
+
+
+def to_ordinals(dates) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: int32 day numbers of a sequence of Date
+    """
+
+    return np.fromiter((d.to_int() for d in dates), dtype=np.int32)
+
+
+def from_ordinals(ordinals: np.ndarray) -> list[Date]:
+    """
+    Returns:
+        list[Date]: Date of each day number
+    """
+
+    return [Date.from_int(o) for o in ordinals.tolist()]
+
+
+def split_ordinals(ordinals: np.ndarray):
+    """
+    Returns:
+        tuple: (year, month, day) arrays of day numbers
+    """
+
+    return _from_ordinal(np.asarray(ordinals, dtype=np.int64))
+
+
+def to_datetime64(ordinals: np.ndarray) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: datetime64[D] of day numbers
+    """
+
+    days = np.asarray(ordinals, dtype=np.int64) - _UNIX_EPOCH
+    return days.astype("datetime64[D]")
+
+
+def from_datetime64(dates: np.ndarray) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: int32 day numbers of datetime64 dates
+    """
+
+    days = np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+    return (days + _UNIX_EPOCH).astype(np.int32)
+
+
+def week_keys(ordinals: np.ndarray) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: Day number of Date.to_week() for each day number
+    """
+
+    ordinals = np.asarray(ordinals, dtype=np.int32)
+    return ordinals - ordinals % 7 + Date.MONDAY_MOD
+
+
+def month_keys(ordinals: np.ndarray) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: 12 * year + month - 1 for each day number
+    """
+
+    year, month, _ = split_ordinals(ordinals)
+    return (12 * year + month - 1).astype(np.int32)
+
+
+def quarter_keys(ordinals: np.ndarray) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: 4 * year + quarter - 1 for each day number
+    """
+
+    year, month, _ = split_ordinals(ordinals)
+    return (4 * year + (month - 1) // 3).astype(np.int32)
+
+
+def year_keys(ordinals: np.ndarray) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: Year of each day number
+    """
+
+    year, _, _ = split_ordinals(ordinals)
+    return year.astype(np.int32)
+
 
-        month = 1
-        while rank > Date.month_days(month, year):
-            rank -= Date.month_days(month, year)
-            month += 1
+def since_epoch(ordinals: np.ndarray) -> np.ndarray:
+    """
+    Returns:
+        np.ndarray: Date.since_epoch() of each day number, the serial written to xlsx
+    """
 
-        return Date(f"{month}/{rank}/{year}")
+    return np.asarray(ordinals, dtype=np.int32) - Date.EPOCH + 1
@@ -0,0 +1,32 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """
+    Returns a module that is only executed the first time one of its attributes is used
+
+    Heavy dependencies are imported this way so that `-h`, or a run that never reaches
+    the code needing them, doesn't pay for loading them.
+
+        Parameters:
+            name (str): Absolute name of the module, such as "numpy"
+
+        Returns:
+            module: The module, already loaded if anything imported it before
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    return module
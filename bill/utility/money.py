@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from decimal import Decimal, ROUND_HALF_EVEN, InvalidOperation
+from functools import total_ordering
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+@total_ordering
+class Money:
+    """
+    An exact, immutable amount of money held as an integer number of cents
+
+    Money deliberately has no float conversion, so it can't be mixed with float
+    arithmetic by accident. Use to_float() where a float is really wanted, such as when
+    writing a workbook.
+    """
+
+    __slots__ = ("cents",)
+
+    def __init__(self, cents: int = 0):
+        object.__setattr__(self, "cents", int(cents))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Money is immutable")
+
+    def __reduce__(self):
+        return (Money, (self.cents,))
+
+    @staticmethod
+    def parse(amount: str | int | float | Money) -> Money:
+        """
+        Returns Money given an amount
+
+            Parameters:
+                amount (str | int | float | Money): Amount in dollars. Strings may
+                    contain thousands separators and a leading "$".
+
+            Returns:
+                Money: amount in cents
+        """
+
+        if isinstance(amount, Money):
+            return amount
+        if isinstance(amount, str):
+            return Money(to_cents(amount))
+        if isinstance(amount, int):
+            return Money(100 * amount)
+        return Money(round(amount * 100))
+
+    def to_float(self) -> float:
+        return self.cents / 100
+
+    def __int__(self) -> int:
+        return self.cents
+
+    def __str__(self) -> str:
+        sign = "-" if self.cents < 0 else ""
+        dollars, cents = divmod(abs(self.cents), 100)
+        return f"{sign}{dollars}.{cents:0>2}"
+
+    def __repr__(self) -> str:
+        return f"Money({str(self)})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.cents == other.cents
+
+    def __lt__(self, other: object) -> bool:
+        if not isinstance(other, Money):
+            return NotImplemented
+        return self.cents < other.cents
+
+    def __hash__(self) -> int:
+        return hash(self.cents)
+
+    def __bool__(self) -> bool:
+        return self.cents != 0
+
+    def __add__(self, other: Money) -> Money:
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.cents + other.cents)
+
+    def __sub__(self, other: Money) -> Money:
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.cents - other.cents)
+
+    def __mul__(self, other: int) -> Money:
+        if not isinstance(other, int):
+            return NotImplemented
+        return Money(self.cents * other)
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> Money:
+        return Money(-self.cents)
+
+    def __abs__(self) -> Money:
+        return Money(abs(self.cents))
+
+
+def to_cents(amount: str) -> int:
+    """
+    Returns the exact number of cents in an amount string
+
+        Parameters:
+            amount (str): The amount to convert, such as "-1,234.5" or "$12.34"
+
+        Returns:
+            int: amount in cents
+    """
+
+    text = amount.strip().replace(",", "").replace("$", "")
+
+    # Fast path for plain amounts with at most two decimals
+    whole, _, frac = text.partition(".")
+    if len(frac) <= 2 and frac.isdigit() or frac == "":
+        sign = -1 if whole.startswith("-") else 1
+        digits = whole[1:] if whole[:1] in ["+", "-"] else whole
+        if (digits == "" and frac != "") or digits.isdigit():
+            return sign * (int(digits or "0") * 100 + int(frac.ljust(2, "0")))
+
+    try:
+        cents = Decimal(text) * 100
+    except InvalidOperation:
+        raise ValueError(f"Unrecognized amount {amount}")
+    return int(cents.to_integral_value(ROUND_HALF_EVEN))
+
+
+def to_cents_array(amounts) -> np.ndarray:
+    """
+    Returns an int64 array of cents given a column of amounts
+
+        Parameters:
+            amounts (iterable): Amount strings, Money, or numbers of dollars
+
+        Returns:
+            np.ndarray: Each amount in cents
+    """
+
+    return np.fromiter(
+        (to_cents(a) if isinstance(a, str) else Money.parse(a).cents for a in amounts),
+        dtype=np.int64,
+    )
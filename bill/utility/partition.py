@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+from .lazy import lazy_import
+from . import store
+from .date import split_ordinals
+
+np = lazy_import("numpy")
+
+INDEX_FILE = "index.json"
+GRANULARITIES = ["month", "year"]
+
+
+def partition_keys(dates: np.ndarray, granularity: str = "month") -> np.ndarray:
+    """
+    Returns the partition of each day number, such as "2024-03" or "2024"
+
+        Parameters:
+            dates (np.ndarray): Day numbers
+            granularity (str): One of GRANULARITIES
+
+        Returns:
+            np.ndarray: Partition key of each date
+    """
+
+    year, month, _ = split_ordinals(dates)
+    if granularity in GRANULARITIES and len(year) == 0:
+        return np.zeros(0, "U7")
+    elif granularity == "month":
+        return np.char.add(
+            np.char.add(year.astype("U4"), "-"), np.char.zfill(month.astype("U2"), 2)
+        )
+    elif granularity == "year":
+        return year.astype("U4")
+
+    raise ValueError(f"Unknown granularity {granularity}")
+
+
+def runs(keys: np.ndarray) -> list[tuple[str, int, int]]:
+    """
+    Returns the partitions of rows in date order, each of which is one contiguous run
+
+        Parameters:
+            keys (np.ndarray): Partition key of each row, as partition_keys
+
+        Returns:
+            list[tuple]: (key, start, end) of each partition, with end exclusive
+    """
+
+    if len(keys) == 0:
+        return []
+
+    bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate(([0], bounds)).tolist()
+    ends = np.concatenate((bounds, [len(keys)])).tolist()
+
+    return [(str(keys[start]), start, end) for start, end in zip(starts, ends)]
+
+
+def read_index(history_dir: str) -> dict:
+    """
+    Returns the index of a history directory, empty if there is none yet
+
+        Parameters:
+            history_dir (str): Directory of the partitions
+
+        Returns:
+            dict: "granularity" and "partitions", where each partition has its "file",
+                "rows", "first" and "last" day numbers, "categories" and "digest"
+    """
+
+    index_path = os.path.join(history_dir, INDEX_FILE)
+    if not os.path.isfile(index_path):
+        return {"granularity": None, "partitions": {}}
+
+    with open(index_path, "r") as f_stream:
+        return json.load(f_stream)
+
+
+def write(
+    history_dir: str,
+    dates: np.ndarray,
+    amounts: np.ndarray,
+    vendors: list[str],
+    categories: list[str],
+    granularity: str = "month",
+    keys: set[str] | None = None,
+) -> list[str]:
+    """
+    Write the full, date-sorted history as one .bill store per partition
+
+    Only partitions whose contents changed are written, and partitions that no longer
+    have any transactions are removed. Given keys, only those partitions are replaced
+    and the rows are all of theirs, so the rest of the history needn't be passed in.
+
+        Parameters:
+            history_dir (str): Directory of the partitions, created if needed
+            dates (np.ndarray): Day number of each transaction, in order
+            amounts (np.ndarray): Cents of each transaction
+            vendors (list[str]): Vendor of each transaction
+            categories (list[str]): Category of each transaction
+            granularity (str): One of GRANULARITIES
+            keys (set[str] | None): Partitions to replace, removing those without
+                any rows. All partitions if None
+
+        Returns:
+            list[str]: Keys of the partitions written
+    """
+
+    os.makedirs(history_dir, exist_ok=True)
+
+    index = read_index(history_dir)
+    old = index["partitions"] if index["granularity"] == granularity else {}
+    if keys is None:
+        partitions = {}
+    elif len(old) < len(index["partitions"]):
+        raise ValueError(f"History in {history_dir} isn't partitioned by {granularity}")
+    else:
+        partitions = {key: entry for key, entry in old.items() if key not in keys}
+    written = []
+
+    dates = np.asarray(dates)
+    amounts = np.asarray(amounts)
+    for key, start, end in runs(partition_keys(dates, granularity)):
+        if keys is not None and key not in keys:
+            raise ValueError(f"Rows of partition {key} given, which isn't in keys")
+
+        vendor_codes, vendor_dict = store.encode(vendors[start:end])
+        category_codes, category_dict = store.encode(categories[start:end])
+        columns = (
+            dates[start:end],
+            amounts[start:end],
+            vendor_codes,
+            vendor_dict,
+            category_codes,
+            category_dict,
+        )
+
+        digest = column_digest(*columns)
+        entry = {
+            "file": f"{key}.bill",
+            "rows": end - start,
+            "first": int(dates[start]),
+            "last": int(dates[end - 1]),
+            "categories": category_dict,
+            "digest": digest,
+        }
+        partitions[key] = entry
+
+        path = os.path.join(history_dir, entry["file"])
+        if old.get(key, {}).get("digest") == digest and os.path.isfile(path):
+            continue
+
+        store.write(path, *columns, is_sorted=True)
+        written.append(key)
+
+    # Remove partitions left empty
+    files = {entry["file"] for entry in partitions.values()}
+    for entry in index["partitions"].values():
+        path = os.path.join(history_dir, entry["file"])
+        if entry["file"] not in files and os.path.isfile(path):
+            os.remove(path)
+
+    tmp = os.path.join(history_dir, f"{INDEX_FILE}.tmp")
+    with open(tmp, "w") as f_stream:
+        json.dump(
+            {
+                "granularity": granularity,
+                "partitions": dict(sorted(partitions.items())),
+            },
+            f_stream,
+        )
+    os.replace(tmp, os.path.join(history_dir, INDEX_FILE))
+
+    return written
+
+
+def read(
+    history_dir: str,
+    start: int | None = None,
+    end: int | None = None,
+    category: str | None = None,
+) -> dict:
+    """
+    Read the transactions between two days from only the partitions that overlap them
+
+        Parameters:
+            history_dir (str): Directory of the partitions
+            start (int | None): First day number, inclusive
+            end (int | None): Last day number, inclusive
+            category (str | None): Skip partitions without this category or any of its
+                subcategories. Rows of other categories are still returned.
+
+        Returns:
+            dict: Arguments of Transactions.from_columns, in date order with
+                dictionaries in order of first appearance
+    """
+
+    index = read_index(history_dir)
+
+    vendor_index: dict[str, int] = {}
+    category_index: dict[str, int] = {}
+    parts: dict[str, list[np.ndarray]] = {
+        "dates": [],
+        "amounts": [],
+        "vendor_codes": [],
+        "category_codes": [],
+    }
+
+    for key in sorted(index["partitions"]):
+        entry = index["partitions"][key]
+        if start is not None and entry["last"] < start:
+            continue
+        if end is not None and entry["first"] > end:
+            continue
+        if category is not None and not any(
+            c == category or c.startswith(f"{category}.") for c in entry["categories"]
+        ):
+            continue
+
+        columns, _ = store.read(os.path.join(history_dir, entry["file"]))
+        dates = columns["dates"]
+
+        rows = slice(
+            0 if start is None else int(np.searchsorted(dates, start, "left")),
+            len(dates) if end is None else int(np.searchsorted(dates, end, "right")),
+        )
+
+        vendor_codes = _recode(
+            columns["vendor_codes"][rows], columns["vendors"], vendor_index
+        )
+        category_codes = _recode(
+            columns["category_codes"][rows], columns["categories"], category_index
+        )
+
+        parts["dates"].append(dates[rows])
+        parts["amounts"].append(columns["amounts"][rows])
+        parts["vendor_codes"].append(vendor_codes)
+        parts["category_codes"].append(category_codes)
+
+    dtypes = dict(store.COLUMNS)
+    merged = {
+        name: np.concatenate(arrays) if len(arrays) > 0 else np.zeros(0, dtypes[name])
+        for name, arrays in parts.items()
+    }
+    merged["vendors"] = list(vendor_index)
+    merged["categories"] = list(category_index)
+
+    return merged
+
+
+def _recode(codes: np.ndarray, dictionary: list[str], merged: dict[str, int]):
+    """
+    Recode a partition's codes into a merged dictionary, adding the strings it uses
+    in order of first appearance
+    """
+
+    if len(codes) == 0:
+        return np.zeros(0, np.int32)
+
+    present, first = np.unique(codes, return_index=True)
+    mapping = np.zeros(len(dictionary), np.int32)
+    for code in present[np.argsort(first)].tolist():
+        mapping[code] = merged.setdefault(dictionary[code], len(merged))
+
+    return mapping[codes]
+
+
+def column_digest(
+    dates, amounts, vendor_codes, vendors, category_codes, categories
+) -> str:
+    """
+    Returns a digest of a partition's columns, which changes with any of its rows
+    """
+
+    digest = hashlib.sha256()
+    for column, dtype in zip(
+        [dates, amounts, vendor_codes, category_codes], dict(store.COLUMNS).values()
+    ):
+        digest.update(np.ascontiguousarray(column, dtype=dtype).tobytes())
+    digest.update("\n".join(vendors).encode())
+    digest.update(b"\0")
+    digest.update("\n".join(categories).encode())
+
+    return digest.hexdigest()
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+_hooks: list = []
+_ids = itertools.count(1)
+_local = threading.local()
+_EPOCH = time.perf_counter()
+
+# Spans open on any thread, which share tracemalloc's one peak
+_open: set = set()
+_open_lock = threading.Lock()
+_started_tracing = False
+
+
+class Span:
+    """
+    A named stage of a run. Item counts can be added while it's open.
+    """
+
+    __slots__ = ("id", "name", "parent", "attributes", "peak")
+
+    def __init__(self, name: str, parent: int | None, attributes: dict):
+        self.id = next(_ids)
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.peak = 0  # Most memory traced while open, in bytes
+
+    def count(self, **counts):
+        """
+        Add to the span's item counts, such as span.count(transactions=n)
+        """
+
+        for key, n in counts.items():
+            self.attributes[key] = self.attributes.get(key, 0) + n
+
+
+def add_hook(hook):
+    """
+    Call hook with the record of every span that finishes from now on
+
+    Records are dicts with the span's "id", "name", "parent" id, "thread", "start" in
+    seconds since import, "wall" and "cpu" seconds, "peak_memory", and its
+    "attributes". Spans are only timed while at least one hook is added.
+
+    "peak_memory" is the most memory allocated during the span, in bytes above what was
+    allocated when it started, as traced by tracemalloc. Tracing starts with the first
+    hook and stops when the last is removed, unless it was already started. It slows
+    allocation, and counts allocations made on other threads while the span is open.
+
+        Parameters:
+            hook (callable): Called with each record, on the thread that ran the span
+    """
+
+    global _started_tracing
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracing = True
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    global _started_tracing
+
+    _hooks.remove(hook)
+    if len(_hooks) == 0 and _started_tracing:
+        tracemalloc.stop()
+        _started_tracing = False
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time the enclosed block as a span, nested in the thread's currently open span
+
+        Parameters:
+            name (str): Stage name, such as "parse.statement"
+            attributes: Labels and initial item counts of the span
+
+        Returns:
+            Span: The open span, to add counts to
+    """
+
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+
+    current = Span(name, stack[-1].id if len(stack) > 0 else None, attributes)
+    if len(_hooks) == 0:
+        yield current
+        return
+
+    base = _open_span(current)
+    stack.append(current)
+    start, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield current
+    finally:
+        wall, cpu = time.perf_counter() - start, time.process_time() - cpu
+        stack.pop()
+        peak = _close_span(current)
+
+        record = {
+            "id": current.id,
+            "name": name,
+            "parent": current.parent,
+            "thread": threading.current_thread().name,
+            "start": start - _EPOCH,
+            "wall": wall,
+            "cpu": cpu,
+            "peak_memory": None if peak is None else max(peak - base, 0),
+            "attributes": current.attributes,
+        }
+        for hook in list(_hooks):
+            hook(record)
+
+
+def prompt(text: str = "") -> str:
+    """
+    input(), as an "input" span so time spent waiting on the user can be told apart
+    """
+
+    with span("input"):
+        return input(text)
+
+
+class Profile:
+    """
+    A hook that collects span records, to write them as a JSON profile
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def __call__(self, record: dict):
+        with self.lock:
+            self.spans.append(record)
+
+    def totals(self) -> dict:
+        """
+        Returns:
+            dict: "count", "wall" and "cpu" seconds and largest "peak_memory" of the
+                spans of each name
+        """
+
+        totals = {}
+        for record in self.spans:
+            total = totals.setdefault(
+                record["name"], {"count": 0, "wall": 0, "cpu": 0, "peak_memory": 0}
+            )
+            total["count"] += 1
+            total["wall"] += record["wall"]
+            total["cpu"] += record["cpu"]
+            total["peak_memory"] = max(total["peak_memory"], record["peak_memory"] or 0)
+
+        return totals
+
+    def write(self, profile_file: str):
+        with self.lock:
+            spans = sorted(self.spans, key=lambda r: r["start"])
+
+        with open(profile_file, "w") as f_stream:
+            json.dump({"totals": self.totals(), "spans": spans}, f_stream, indent=2)
+
+
+@contextmanager
+def profiled(profile_file: str | None):
+    """
+    Collect the spans of the enclosed block, written to profile_file when it exits.
+    Does nothing if profile_file is None.
+    """
+
+    if profile_file is None:
+        yield None
+        return
+
+    profile = Profile()
+    add_hook(profile)
+    try:
+        with span("run"):
+            yield profile
+    finally:
+        remove_hook(profile)
+        profile.write(profile_file)
+
+
+def _open_span(current: Span) -> int:
+    """
+    Start tracking the peak memory of a span
+
+    Returns:
+        int: Bytes traced when it started
+    """
+
+    with _open_lock:
+        if not tracemalloc.is_tracing():
+            return 0
+
+        # The peak is reset for the new span, so the open spans take theirs first
+        traced, peak = tracemalloc.get_traced_memory()
+        for other in _open:
+            other.peak = max(other.peak, peak)
+        tracemalloc.reset_peak()
+
+        current.peak = traced
+        _open.add(current)
+        return traced
+
+
+def _close_span(current: Span) -> int | None:
+    """
+    Returns:
+        int | None: Most bytes traced while the span was open, None if not traced
+    """
+
+    with _open_lock:
+        if current not in _open:
+            return None
+        _open.remove(current)
+
+        if not tracemalloc.is_tracing():
+            return None
+        return max(current.peak, tracemalloc.get_traced_memory()[1])
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import json
+import os
+import struct
+
+from .lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Layout of a .bill file:
+#   MAGIC, then the length of the header as a little endian uint64
+#   The header: JSON metadata, including the vendor and category dictionaries
+#   Each column, starting on an ALIGN byte boundary
+MAGIC = b"BILLTRX\x00"
+VERSION = 1
+ALIGN = 64
+
+COLUMNS = [
+    ("dates", "<i4"),  # Date.to_int() day numbers
+    ("amounts", "<i8"),  # Cents
+    ("vendor_codes", "<i4"),  # Index into the vendor dictionary
+    ("category_codes", "<i4"),  # Index into the category dictionary
+]
+
+
+def encode(values: list[str]) -> tuple[np.ndarray, list[str]]:
+    """
+    Dictionary encode a column of strings
+
+        Parameters:
+            values (list[str]): The column
+
+        Returns:
+            tuple: (codes, dictionary) with strings in order of first appearance, so
+                dictionary[codes[i]] == values[i]
+    """
+
+    index: dict[str, int] = {}
+    codes = np.fromiter(
+        (index.setdefault(v, len(index)) for v in values),
+        dtype=np.int32,
+        count=len(values),
+    )
+    return codes, list(index)
+
+
+def write(
+    store_file: str,
+    dates: np.ndarray,
+    amounts: np.ndarray,
+    vendor_codes: np.ndarray,
+    vendors: list[str],
+    category_codes: np.ndarray,
+    categories: list[str],
+    is_sorted: bool = False,
+):
+    """
+    Write transaction columns to a .bill file, replacing it atomically
+
+        Parameters:
+            store_file (str): Path of the .bill file
+            dates (np.ndarray): Day numbers
+            amounts (np.ndarray): Amounts in cents
+            vendor_codes (np.ndarray): Index into vendors of each transaction
+            vendors (list[str]): Vendor dictionary
+            category_codes (np.ndarray): Index into categories of each transaction
+            categories (list[str]): Category dictionary
+            is_sorted (bool): Whether the transactions are in date order
+    """
+
+    data = {
+        "dates": dates,
+        "amounts": amounts,
+        "vendor_codes": vendor_codes,
+        "category_codes": category_codes,
+    }
+    rows = len(dates)
+
+    # Column offsets are relative to the end of the header, so they don't depend on
+    # the header's own length
+    columns = {}
+    offset = 0
+    for name, dtype in COLUMNS:
+        columns[name] = {"dtype": dtype, "offset": offset}
+        offset = _aligned(offset + rows * np.dtype(dtype).itemsize)
+
+    header = json.dumps(
+        {
+            "version": VERSION,
+            "rows": rows,
+            "sorted": is_sorted,
+            "columns": columns,
+            "vendors": vendors,
+            "categories": categories,
+        }
+    ).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    tmp = f"{store_file}.tmp"
+    with open(tmp, "wb") as f_stream:
+        f_stream.write(MAGIC)
+        f_stream.write(struct.pack("<Q", len(header)))
+        f_stream.write(header)
+
+        for name, dtype in COLUMNS:
+            f_stream.seek(data_start + columns[name]["offset"])
+            f_stream.write(np.ascontiguousarray(data[name], dtype=dtype).tobytes())
+
+        f_stream.truncate(data_start + offset)
+
+    os.replace(tmp, store_file)
+
+
+def read(store_file: str) -> tuple[dict, dict]:
+    """
+    Open a .bill file. The columns are read-only views of a memory map of the file, so
+    nothing is read until it's used.
+
+        Parameters:
+            store_file (str): Path of the .bill file
+
+        Returns:
+            tuple: (columns, metadata) where columns holds the arguments of
+                Transactions.from_columns, and metadata the rest of the header
+    """
+
+    with open(store_file, "rb") as f_stream:
+        if f_stream.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{store_file} is not a transaction store")
+
+        (header_len,) = struct.unpack("<Q", f_stream.read(8))
+        metadata = json.loads(f_stream.read(header_len))
+
+    if metadata["version"] != VERSION:
+        raise ValueError(
+            f"{store_file} is version {metadata['version']}, expected {VERSION}"
+        )
+
+    data_start = _aligned(len(MAGIC) + 8 + header_len)
+    rows = metadata["rows"]
+    mapped = np.memmap(store_file, dtype=np.uint8, mode="r")
+
+    columns = {
+        name: np.frombuffer(
+            mapped,
+            dtype=info["dtype"],
+            count=rows,
+            offset=data_start + info["offset"],
+        )
+        for name, info in metadata.pop("columns").items()
+    }
+    columns["vendors"] = metadata.pop("vendors")
+    columns["categories"] = metadata.pop("categories")
+
+    return columns, metadata
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGN) * ALIGN
@@ -0,0 +1,368 @@
+import csv
+import io
+import os
+import time
+
+from .analyze import create_doc
+from .analyze.cube import RollupCube
+from .analyze.transactions import Transactions
+from .parse import categorize, rules, tracker
+from .parse.alerts import AlertMonitor
+from .utility import partition, profile, store
+from .utility.date import to_ordinals
+
+
+class StatementWatcher:
+    """
+    Keeps the outputs of a statement directory up to date as statements arrive
+
+    Statements are parsed once, and their categorized transactions, the compiled
+    categories, alert statistics and rollup cube are kept in memory between polls. A
+    poll only parses statements that are new or changed, and only rewrites the outputs
+    when something changed. Only the history partitions of months whose transactions
+    changed are sorted and rewritten, and the cube only reads those partitions.
+
+    all_transactions.csv, all_transactions.bill and the workbook hold the whole history,
+    so they're still rewritten whole: the CSV from the text of each month kept in
+    memory, and the .bill and workbook from the history partitions.
+
+    Nobody is around to answer prompts, so transactions no category matches are left
+    as "~" and listed in uncategorized.txt, as in a run where every prompt is skipped.
+    """
+
+    def __init__(
+        self,
+        in_dir: str,
+        out_dir: str,
+        cat_file: str,
+        xlsx_file: str | None = None,
+        cube_file: str | None = None,
+        constant_memory: bool = False,
+    ):
+        """
+        Args:
+            in_dir (str): Directory statements are dropped into
+            out_dir (str): Directory to write all_transactions.csv, bills.xlsx and
+                the rest into. Existing outputs are replaced, not deleted first
+            cat_file (str): categories.csv to categorize with, reloaded when changed
+            xlsx_file (str | None): Workbook to write. Defaults to bills.xlsx in
+                out_dir
+            cube_file (str | None): Rollup cube to keep the week and month totals in
+            constant_memory (bool): Stream the workbook's rows to disk
+        """
+
+        if os.path.isfile(out_dir):
+            raise TypeError("Output directory must not be a file.")
+        os.makedirs(out_dir, exist_ok=True)
+
+        self.in_dir = in_dir
+        self.out_dir = out_dir
+        self.cat_file = cat_file
+        self.xlsx_file = xlsx_file or os.path.join(out_dir, "bills.xlsx")
+        self.cube_file = cube_file
+        self.constant_memory = constant_memory
+
+        self.monitor = AlertMonitor(
+            os.path.join(os.path.dirname(cat_file), "alerts.json"),
+            os.path.join(os.path.dirname(cat_file), "alerts_state.json"),
+        )
+        self.cube = None if cube_file is None else RollupCube.load(cube_file)
+
+        self.rule_set = None
+        self.cat_stamp = None
+        self.stamps: dict[str, tuple] = {}  # Statement -> (mtime, size) when parsed
+        self.unsettled: dict[str, tuple] = {}  # Statement -> (mtime, size) last poll
+        self.transactions: dict[str, list[dict]] = {}  # Statement -> transactions
+        self.months: dict[str, set[str]] = {}  # Statement -> months of transactions
+        self.changed: set[str] | None = None  # Months changed since written, or all
+        self.csv: dict[str, str] = {}  # Month -> its rows of all_transactions.csv
+        self.uncategorized: dict[str, list[tuple]] = {}  # Month -> its "~" rows
+
+    def poll(self) -> bool:
+        """
+        Parse new and changed statements, and bring the outputs up to date
+
+        A statement is only read once its size and modification time are unchanged
+        between two polls, so a statement that's still being copied in isn't read half
+        written. This includes the statements already in in_dir when watching starts,
+        which are read by the second poll.
+
+        Returns:
+            bool: Whether the outputs were rewritten
+        """
+
+        recategorized = self._load_categories()
+
+        ready, removed = self._scan()
+        new = []
+        for statement in ready:
+            try:
+                trans = tracker.read_statement(self.in_dir, statement)
+            except Exception as e:
+                print(f"Warning: could not read {statement}: {e}")
+                trans = []
+
+            cats = self.rule_set.categorize(trans) if len(trans) > 0 else []
+            for t, cat in zip(trans, cats):
+                t["category"] = cat
+
+            if statement in self.transactions:
+                removed.append(statement)
+                self._mark(self.months[statement])
+            self.transactions[statement] = trans
+            self.months[statement] = {_month(t) for t in trans}
+            self._mark(self.months[statement])
+            new.extend(trans)
+
+        for statement in removed:
+            if statement not in ready:
+                self._mark(self.months.pop(statement, set()))
+                self.transactions.pop(statement, None)
+
+        if len(new) == 0 and len(removed) == 0 and not recategorized:
+            return False
+
+        if not any(len(trans) > 0 for trans in self.transactions.values()):
+            print("0 transactions found. Waiting for statements")
+            return False
+
+        print(
+            f"{len(ready)} statements read, {len(removed)} changed or removed. "
+            f"Writing to {self.out_dir}"
+        )
+        self._write(new)
+        return True
+
+    def run(self, interval: float = 5.0):
+        """
+        Poll every interval seconds until interrupted
+
+        Args:
+            interval (float): Seconds between polls
+        """
+
+        print(f"Watching {self.in_dir} every {interval:g} seconds. Ctrl+C to stop")
+        try:
+            while True:
+                with profile.span("watch.poll"):
+                    self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Stopped watching")
+
+    def _load_categories(self) -> bool:
+        """
+        (Re)load cat_file if it changed, recategorizing every transaction
+
+        Returns:
+            bool: Whether the category of any transaction changed
+        """
+
+        stamp = _stamp(self.cat_file)
+        if self.rule_set is not None and stamp == self.cat_stamp:
+            return False
+
+        self.rule_set = rules.RuleSet(categorize.read_categories(self.cat_file))
+        self.cat_stamp = stamp
+
+        if len(self.transactions) == 0:
+            return False
+
+        changed = set()
+        for trans in self.transactions.values():
+            if len(trans) == 0:
+                continue
+            for t, cat in zip(trans, self.rule_set.categorize(trans)):
+                if t["category"] != cat:
+                    t["category"] = cat
+                    changed.add(_month(t))
+        self._mark(changed)
+
+        return len(changed) > 0
+
+    def _scan(self) -> tuple[list[str], list[str]]:
+        """
+        Returns:
+            tuple: (ready, removed) statements, where ready are new or changed and
+                settled, and removed are parsed before but no longer in in_dir
+        """
+
+        current = {}
+        if os.path.isdir(self.in_dir):
+            for statement in os.listdir(self.in_dir):
+                path = os.path.join(self.in_dir, statement)
+                if statement.startswith(".") or not os.path.isfile(path):
+                    continue
+                current[statement] = _stamp(path)
+
+        ready = []
+        unsettled = {}
+        for statement, stamp in sorted(current.items()):
+            if self.stamps.get(statement) == stamp:
+                continue
+            if self.unsettled.get(statement) == stamp:
+                ready.append(statement)
+                self.stamps[statement] = stamp
+            else:
+                unsettled[statement] = stamp
+        self.unsettled = unsettled
+
+        removed = [s for s in self.stamps if s not in current]
+        for statement in removed:
+            del self.stamps[statement]
+
+        return ready, removed
+
+    def _mark(self, months: set[str]):
+        """
+        Mark months whose transactions changed, to be rewritten by the next _write
+        """
+
+        if self.changed is not None:
+            self.changed |= months
+
+    def _write(self, new: list[dict]):
+        """
+        Rewrite the history partitions of the changed months, and the outputs holding
+        the whole history, and bring the cube up to date with them
+
+        The first write rewrites every month, as out_dir may hold the history of other
+        statements. Partitions whose rows are unchanged still aren't written.
+
+        Args:
+            new (list[dict]): Transactions of the statements read this poll, whose
+                alerts are checked
+        """
+
+        history_dir = os.path.join(self.out_dir, "history")
+        months = self.changed
+        if months is None:
+            self.csv = {}
+            self.uncategorized = {}
+        else:
+            for month in months:
+                self.csv.pop(month, None)
+                self.uncategorized.pop(month, None)
+
+        trans_dict = sorted(
+            (
+                t
+                for statement, trans in self.transactions.items()
+                if months is None or not self.months[statement].isdisjoint(months)
+                for t in trans
+                if months is None or _month(t) in months
+            ),
+            key=lambda t: t["date"].to_int(),
+        )
+        trans = [
+            (t["date"], t["amount"], t["vendor"], t["category"]) for t in trans_dict
+        ]
+
+        dates = to_ordinals(t[0] for t in trans)
+        with profile.span("write.history", rows=len(trans)) as span:
+            written = partition.write(
+                history_dir,
+                dates,
+                [t[1].cents for t in trans],
+                [t[2] for t in trans],
+                [t[3] for t in trans],
+                keys=months,
+            )
+            span.count(partitions=len(written))
+        print(f"{len(written)} history partitions updated")
+
+        for month, start, end in partition.runs(partition.partition_keys(dates)):
+            text = io.StringIO()
+            csv.writer(text).writerows(trans[start:end])
+            self.csv[month] = text.getvalue()
+            self.uncategorized[month] = [
+                t for t in trans[start:end] if t[3].split(".")[0] == "~"
+            ]
+        self.changed = set()
+
+        with profile.span("write.csv"), open(
+            os.path.join(self.out_dir, "all_transactions.csv"), "w", newline=""
+        ) as f_stream:
+            for month in sorted(self.csv):
+                f_stream.write(self.csv[month])
+
+        columns = partition.read(history_dir)
+        with profile.span("write.store", rows=len(columns["dates"])):
+            store.write(
+                os.path.join(self.out_dir, "all_transactions.bill"),
+                **columns,
+                is_sorted=True,
+            )
+
+        if len(new) > 0:
+            new = sorted(new, key=lambda t: t["date"].to_int())
+            tracker.check_alerts(
+                self.monitor, new, [t["category"] for t in new], self.out_dir
+            )
+        tracker.write_uncategorized(
+            self.out_dir,
+            [
+                t
+                for month in sorted(self.uncategorized)
+                for t in self.uncategorized[month]
+            ],
+        )
+
+        # The loaded cube may hold statements of an earlier run, or their old
+        # categories, whose digests differ from the history just written
+        if self.cube is not None and self.cube.sync(history_dir) > 0:
+            self.cube.save(self.cube_file)
+
+        print(f"Writing {self.xlsx_file}")
+        create_doc.write_workbook(
+            Transactions.from_columns(**columns),
+            self.xlsx_file,
+            None,
+            self.constant_memory,
+            cube=self.cube,
+        )
+
+
+def watch(
+    in_dir: str,
+    out_dir: str,
+    cat_file: str,
+    xlsx_file: str | None = None,
+    cube_file: str | None = None,
+    constant_memory: bool = False,
+    interval: float = 5.0,
+):
+    """
+    Watch in_dir, keeping out_dir up to date as statements arrive, until interrupted
+
+        Parameters:
+            in_dir (str): Directory statements are dropped into
+            out_dir (str): Directory to write all_transactions.csv and the rest into
+            cat_file (str): categories.csv to categorize with
+            xlsx_file (str | None): Workbook to write. Defaults to bills.xlsx in
+                out_dir
+            cube_file (str | None): Rollup cube to keep the week and month totals in
+            constant_memory (bool): Stream the workbook's rows to disk
+            interval (float): Seconds between polls of in_dir
+    """
+
+    watcher = StatementWatcher(
+        in_dir, out_dir, cat_file, xlsx_file, cube_file, constant_memory
+    )
+    watcher.run(interval)
+
+
+def _month(trans: dict) -> str:
+    """
+    Returns the history partition of a transaction, as partition.partition_keys
+    """
+
+    return f"{trans['date'].year:04}-{trans['date'].month:02}"
+
+
+def _stamp(path: str) -> tuple | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
@@ -1,6 +1,5 @@
 from setuptools import setup, find_packages
 
-
 with open("README.rst") as f:
     readme = f.read()
 
@@ -17,4 +16,5 @@ setup(
     url="https://github.com/mabelechols/bill_tracker",
     license=license,
     packages=find_packages(),
+    entry_points={"console_scripts": ["bill = bill.__main__:main"]},
 )
@@ -0,0 +1,58 @@
+import unittest
+
+from bill.analyze.recurring import find_recurring
+from bill.analyze.transactions import Transactions
+from bill.utility.date import Date
+from bill.utility.money import Money
+
+
+def monthly(transactions, vendor, amount, first, n):
+    day = Date(first).to_int()
+    for i in range(n):
+        transactions.add_transaction(
+            Date.from_int(day + 30 * i), amount, vendor, "fun.streaming"
+        )
+
+
+class FindRecurringTest(unittest.TestCase):
+    def test_price_increase_continues_the_charge(self):
+        transactions = Transactions()
+        monthly(transactions, "NETFLIX.COM*A1", "9.99", "01/05/2024", 6)
+        monthly(transactions, "NETFLIX.COM*B2", "15.49", "07/03/2024", 3)
+        transactions.add_transaction("03/20/2024", "60.00", "NETFLIX.COM", "fun")
+        transactions.sort()
+
+        recurring = find_recurring(transactions)
+
+        self.assertEqual(len(recurring), 1)
+        charge = recurring[0]
+        self.assertEqual(charge["frequency"], "monthly")
+        self.assertEqual(charge["charges"], 9)
+        self.assertEqual(charge["previous_amount"], Money.parse("9.99"))
+        self.assertEqual(charge["last_amount"], Money.parse("15.49"))
+        self.assertTrue(charge["price_increase"])
+
+    def test_price_increase_on_the_latest_charge(self):
+        transactions = Transactions()
+        monthly(transactions, "SPOTIFY", "10.99", "01/10/2024", 5)
+        monthly(transactions, "SPOTIFY", "14.99", "06/08/2024", 1)
+
+        recurring = find_recurring(transactions)
+
+        self.assertEqual(len(recurring), 1)
+        self.assertEqual(recurring[0]["charges"], 6)
+        self.assertTrue(recurring[0]["price_increase"])
+
+    def test_steady_price(self):
+        transactions = Transactions()
+        monthly(transactions, "GYM #4", "25.00", "01/01/2024", 4)
+
+        recurring = find_recurring(transactions)
+
+        self.assertEqual(len(recurring), 1)
+        self.assertFalse(recurring[0]["price_increase"])
+        self.assertEqual(recurring[0]["previous_amount"], Money.parse("25.00"))
+
+
+if __name__ == "__main__":
+    unittest.main()